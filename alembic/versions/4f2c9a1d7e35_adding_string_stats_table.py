@@ -0,0 +1,50 @@
+"""adding string stats table
+
+Revision ID: 4f2c9a1d7e35
+Revises: b733ecea8601
+Create Date: 2026-10-19 09:12:41.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4f2c9a1d7e35'
+down_revision: Union[str, Sequence[str], None] = 'b733ecea8601'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('stringstats',
+    sa.Column('metric', sa.String(length=32), nullable=False),
+    sa.Column('bucket', sa.String(length=32), nullable=False),
+    sa.Column('count', sa.BigInteger(), server_default=sa.text('0'), nullable=False),
+    sa.PrimaryKeyConstraint('metric', 'bucket')
+    )
+    # backfill the counters from the rows that already exist
+    op.execute("""
+        INSERT INTO stringstats (metric, bucket, count)
+        SELECT 'total', 'all', count(*) FROM stringanalysis
+        UNION ALL
+        SELECT 'length_sum', 'all', coalesce(sum((properties->>'length')::int), 0) FROM stringanalysis
+        UNION ALL
+        SELECT 'palindrome', properties->>'is_palindrome', count(*) FROM stringanalysis GROUP BY 2
+        UNION ALL
+        SELECT 'length',
+               ((properties->>'length')::int / 10 * 10)::text || '-' || ((properties->>'length')::int / 10 * 10 + 9)::text,
+               count(*)
+        FROM stringanalysis GROUP BY 2
+        UNION ALL
+        SELECT 'word_count', properties->>'word_count', count(*) FROM stringanalysis GROUP BY 2
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('stringstats')
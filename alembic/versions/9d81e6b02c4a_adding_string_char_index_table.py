@@ -0,0 +1,42 @@
+"""adding string char index table
+
+Revision ID: 9d81e6b02c4a
+Revises: 4f2c9a1d7e35
+Create Date: 2026-10-19 11:03:27.540916
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9d81e6b02c4a'
+down_revision: Union[str, Sequence[str], None] = '4f2c9a1d7e35'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('stringcharindex',
+    sa.Column('char', sa.String(length=8), nullable=False),
+    sa.Column('string_id', sa.String(length=64), nullable=False),
+    sa.ForeignKeyConstraint(['string_id'], ['stringanalysis.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('char', 'string_id')
+    )
+    op.create_index(op.f('ix_stringcharindex_string_id'), 'stringcharindex', ['string_id'], unique=False)
+    # backfill the posting lists from the stored character frequency maps
+    op.execute("""
+        INSERT INTO stringcharindex (char, string_id)
+        SELECT c, id FROM stringanalysis, jsonb_object_keys(properties->'character_frequency_map') AS c
+        ON CONFLICT DO NOTHING
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_stringcharindex_string_id'), table_name='stringcharindex')
+    op.drop_table('stringcharindex')
@@ -0,0 +1,45 @@
+"""adding email outbox table
+
+Revision ID: c3e07f5b9a12
+Revises: 9d81e6b02c4a
+Create Date: 2026-10-19 13:47:09.215583
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3e07f5b9a12'
+down_revision: Union[str, Sequence[str], None] = '9d81e6b02c4a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('email_outbox',
+    sa.Column('id', sa.BigInteger(), autoincrement=True, nullable=False),
+    sa.Column('recipient', sa.String(), nullable=False),
+    sa.Column('subject', sa.String(), nullable=False),
+    sa.Column('html', sa.Text(), nullable=False),
+    sa.Column('status', sa.String(length=16), server_default=sa.text("'pending'"), nullable=False),
+    sa.Column('attempts', sa.Integer(), server_default=sa.text('0'), nullable=False),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('available_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('sent_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_email_outbox_status'), 'email_outbox', ['status'], unique=False)
+    op.create_index('ix_email_outbox_pending', 'email_outbox', ['available_at'], unique=False, postgresql_where=sa.text("status = 'pending'"))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_email_outbox_pending', table_name='email_outbox', postgresql_where=sa.text("status = 'pending'"))
+    op.drop_index(op.f('ix_email_outbox_status'), table_name='email_outbox')
+    op.drop_table('email_outbox')
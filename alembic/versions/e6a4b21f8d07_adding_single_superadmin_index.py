@@ -0,0 +1,29 @@
+"""adding single superadmin index
+
+Revision ID: e6a4b21f8d07
+Revises: c3e07f5b9a12
+Create Date: 2026-10-19 15:21:52.603117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e6a4b21f8d07'
+down_revision: Union[str, Sequence[str], None] = 'c3e07f5b9a12'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ux_users_single_superadmin', 'users', ['role'], unique=True, postgresql_where=sa.text("role = 'superadmin'"))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ux_users_single_superadmin', table_name='users', postgresql_where=sa.text("role = 'superadmin'"))
@@ -0,0 +1,10 @@
+import os
+import time
+
+#the startup report measures from here
+STARTED_AT = time.perf_counter()
+
+#read from the environment directly, nothing else should be imported before the timer
+if os.environ.get("IMPORT_TIME_REPORT", "").lower() in ("1", "true", "yes", "on"):
+    from .utils.import_timer import install
+    install()
@@ -0,0 +1,41 @@
+"""
+Write the OpenAPI document to disk.
+
+    python -m app.cli.export_openapi
+    python -m app.cli.export_openapi build/openapi.json
+
+Writes the schema byte for byte as /openapi.json serves it, plus .gz and, when
+brotli is installed, .br siblings, so a static host or CDN can serve it
+without the app. Point OPENAPI_FILE at the output to serve the same file.
+"""
+import argparse
+from pathlib import Path
+from ..utils.compression import SUPPORTED_ENCODINGS, compress, etag_for
+from ..utils.openapi_cache import render_openapi
+
+SUFFIXES = {"gzip": ".gz", "br": ".br"}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", type=Path, nargs="?", default=Path("openapi.json"))
+    parser.add_argument("--no-compressed", action="store_true", help="only write the plain JSON")
+    args = parser.parse_args()
+
+    # imported here so --help works without the app's environment
+    from ..main import app
+    body = render_openapi(app)
+    args.path.parent.mkdir(parents=True, exist_ok=True)
+    args.path.write_bytes(body)
+    print(f"{args.path} {len(body)} bytes etag {etag_for(body)}")
+    if args.no_compressed:
+        return
+    for encoding in SUPPORTED_ENCODINGS:
+        target = args.path.with_name(args.path.name + SUFFIXES[encoding])
+        compressed = compress(body, encoding)
+        target.write_bytes(compressed)
+        print(f"{target} {len(compressed)} bytes")
+
+
+if __name__ == "__main__":
+    main()
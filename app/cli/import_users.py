@@ -0,0 +1,39 @@
+"""
+Bulk user import from the command line.
+
+    python -m app.cli.import_users users.csv
+    python -m app.cli.import_users users.ndjson --report report.json
+
+The format is taken from the file extension unless --format is given. The per
+row report is printed as JSON, or written to --report.
+"""
+import argparse
+import asyncio
+from pathlib import Path
+from ..database_setup import async_session
+from ..crud.add_user import bulk_import_users
+
+
+async def run(path: Path, fmt: str):
+    async with async_session() as session:
+        return await bulk_import_users(path.read_bytes(), fmt, session)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", type=Path)
+    parser.add_argument("--format", choices=["csv", "ndjson"])
+    parser.add_argument("--report", type=Path, help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+    fmt = args.format or ("csv" if args.path.suffix.lower() == ".csv" else "ndjson")
+    report = asyncio.run(run(args.path, fmt))
+    output = report.model_dump_json(indent=2)
+    if args.report:
+        args.report.write_text(output)
+        print(f"{report.created} created, {report.duplicates} duplicates, {report.invalid} invalid -> {args.report}")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
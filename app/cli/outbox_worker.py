@@ -0,0 +1,31 @@
+"""
+Standalone email outbox relay.
+
+    python -m app.cli.outbox_worker
+
+Set OUTBOX_RELAY_IN_APP=False on the web process when this runs separately.
+"""
+import asyncio
+import logging
+import signal
+from ..utils.email_outbox import OutboxRelay
+from ..utils.logging_setup import configure_logging
+
+logger = logging.getLogger(__name__)
+
+
+async def main():
+    relay = OutboxRelay()
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    logger.info("outbox worker started, batch size %d", relay.batch_size)
+    await relay.run(stop)
+    await relay.dispatcher.stop()
+    logger.info("outbox worker stopped: %s", relay.stats)
+
+
+if __name__ == "__main__":
+    configure_logging()
+    asyncio.run(main())
@@ -0,0 +1,265 @@
+"""
+Production server: a pre-forking supervisor running uvicorn workers.
+
+    python -m app.cli.serve
+    python -m app.cli.serve --workers 4 --max-requests 10000
+
+The app is imported once in the supervisor (preload), so a broken config fails
+before any worker starts and the imported modules and the OpenAPI cache are
+shared copy on write. The supervisor binds the socket, forks WEB_CONCURRENCY
+workers (default: the CPUs this process may run on) and replaces any worker
+that exits. uvloop and httptools are used when installed.
+
+SIGTERM or SIGINT stops the workers gracefully: each stops accepting, finishes
+in-flight requests within GRACEFUL_TIMEOUT, then runs the lifespan shutdown,
+which drains the email outbox relay and its dispatcher. Workers still running
+after SHUTDOWN_TIMEOUT are killed. With MAX_REQUESTS a worker is recycled the
+same way after that many requests, plus a random MAX_REQUESTS_JITTER so
+workers do not restart together.
+
+Per worker state when several run:
+- string mirror (STRING_MIRROR_ENABLED): loaded per worker, a worker sees
+  other workers' writes once the background warmer reloads it
+  (WARMER_CACHE_REFRESH)
+- admission control pools: capacities apply per worker
+- metrics: one shard per worker merged through METRICS_DIR, which is set to a
+  temporary directory when more than one worker runs and it is unset; the
+  supervisor archives the counters of every worker it reaps
+- verification replay filter: per worker, misses fall back to the database
+- email outbox relay: one per worker, SKIP LOCKED keeps them from double sending
+- OpenAPI cache: built once in the supervisor, identical everywhere
+"""
+import argparse
+import logging
+import os
+import random
+import signal
+import socket
+import sys
+import tempfile
+import time
+from importlib.util import find_spec
+from decouple import config
+
+
+def default_workers():
+    # the affinity mask honours cpusets and taskset, cpu_count does not
+    if hasattr(os, "sched_getaffinity"):
+        return max(1, len(os.sched_getaffinity(0)))
+    return os.cpu_count() or 1
+
+
+WEB_CONCURRENCY = config("WEB_CONCURRENCY", default=0, cast=int) or default_workers()
+HOST = config("HOST", default="0.0.0.0")
+PORT = config("PORT", default=8000, cast=int)
+BACKLOG = config("BACKLOG", default=2048, cast=int)
+#0 never recycles workers
+MAX_REQUESTS = config("MAX_REQUESTS", default=0, cast=int)
+#-1 picks a tenth of MAX_REQUESTS
+MAX_REQUESTS_JITTER = config("MAX_REQUESTS_JITTER", default=-1, cast=int)
+#seconds in-flight requests get once a worker is told to stop
+GRACEFUL_TIMEOUT = config("GRACEFUL_TIMEOUT", default=30, cast=int)
+#seconds before remaining workers are killed, covers the graceful period plus the email drain
+SHUTDOWN_TIMEOUT = config("SHUTDOWN_TIMEOUT", default=45, cast=int)
+KEEP_ALIVE_TIMEOUT = config("KEEP_ALIVE_TIMEOUT", default=5, cast=int)
+FORWARDED_ALLOW_IPS = config("FORWARDED_ALLOW_IPS", default="127.0.0.1")
+#a worker dying this soon after starting counts as a failed boot
+BOOT_GRACE = 5.0
+MAX_BOOT_FAILURES = 5
+
+logger = logging.getLogger("app.cli.serve")
+
+
+def event_loop():
+    return "uvloop" if find_spec("uvloop") else "asyncio"
+
+
+def http_protocol():
+    return "httptools" if find_spec("httptools") else "h11"
+
+
+def bind_socket(host, port, backlog):
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+class Supervisor:
+    def __init__(self, app, sock, workers, max_requests=MAX_REQUESTS, max_requests_jitter=MAX_REQUESTS_JITTER):
+        self.app = app
+        self.sock = sock
+        self.workers = workers
+        self.max_requests = max_requests
+        self.max_requests_jitter = max_requests_jitter
+        self.children = {}
+        self.stopping = False
+        self.boot_failures = 0
+
+    def _limit(self):
+        if not self.max_requests:
+            return None
+        jitter = self.max_requests // 10 if self.max_requests_jitter < 0 else self.max_requests_jitter
+        return self.max_requests + random.randint(0, jitter)
+
+    def spawn(self):
+        limit = self._limit()
+        pid = os.fork()
+        if pid:
+            self.children[pid] = time.monotonic()
+            return pid
+        # worker: own process group so a terminal ^C reaches only the supervisor,
+        # which then stops every worker exactly once
+        os.setpgid(0, 0)
+        from ..utils.startup import reset_start_time
+        reset_start_time()
+        for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP, signal.SIGCHLD):
+            signal.signal(sig, signal.SIG_DFL)
+        code = 0
+        try:
+            run_worker(self.app, self.sock, limit)
+        except BaseException:
+            logger.exception("worker %d crashed", os.getpid())
+            code = 1
+        finally:
+            # os._exit skips atexit, flush the log queue by hand
+            from ..utils.logging_setup import shutdown_logging
+            shutdown_logging()
+            os._exit(code)
+
+    def _stop(self, signum, frame):
+        self.stopping = True
+
+    def _reap(self, block):
+        try:
+            pid, status = os.waitpid(-1, 0 if block else os.WNOHANG)
+        except ChildProcessError:
+            return None
+        if pid == 0:
+            return None
+        started = self.children.pop(pid, None)
+        code = os.waitstatus_to_exitcode(status)
+        self._archive_metrics(pid)
+        return pid, code, started
+
+    def _archive_metrics(self, pid):
+        # a worker that crashed or was killed never archived its own counters
+        from ..utils.metrics import mark_process_dead
+        try:
+            mark_process_dead(pid)
+        except OSError as e:
+            logger.warning("could not archive metrics of worker %d: %s", pid, e)
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+        for _ in range(self.workers):
+            self.spawn()
+        logger.info("serving on %s:%d with %d workers (%s, %s)", *self.sock.getsockname()[:2], self.workers, event_loop(), http_protocol())
+
+        while not self.stopping:
+            reaped = self._reap(block=False)
+            if reaped is None:
+                time.sleep(0.2)
+                continue
+            pid, code, started = reaped
+            if started is not None and code != 0 and time.monotonic() - started < BOOT_GRACE:
+                self.boot_failures += 1
+                logger.error("worker %d failed to boot (exit %d)", pid, code)
+                if self.boot_failures >= MAX_BOOT_FAILURES:
+                    logger.error("%d workers failed to boot, shutting down", self.boot_failures)
+                    self.stopping = True
+                    break
+                time.sleep(1.0)
+            else:
+                self.boot_failures = 0
+                # exit 0 is a recycle after max requests
+                logger.info("worker %d exited (%d), starting a replacement", pid, code)
+            self.spawn()
+        return self.shutdown()
+
+    def shutdown(self):
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        deadline = time.monotonic() + SHUTDOWN_TIMEOUT
+        while self.children and time.monotonic() < deadline:
+            if self._reap(block=False) is None:
+                time.sleep(0.1)
+        for pid in list(self.children):
+            logger.warning("worker %d did not stop within %ds, killing it", pid, SHUTDOWN_TIMEOUT)
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+            self.children.pop(pid, None)
+            self._archive_metrics(pid)
+        self.sock.close()
+        return 1 if self.boot_failures >= MAX_BOOT_FAILURES else 0
+
+
+def uvicorn_config(app, limit_max_requests=None, **overrides):
+    import uvicorn
+    options = dict(
+        loop=event_loop(),
+        http=http_protocol(),
+        lifespan="on",
+        # logging is already routed through app.utils.logging_setup
+        log_config=None,
+        proxy_headers=True,
+        forwarded_allow_ips=FORWARDED_ALLOW_IPS,
+        timeout_keep_alive=KEEP_ALIVE_TIMEOUT,
+        timeout_graceful_shutdown=GRACEFUL_TIMEOUT,
+        limit_max_requests=limit_max_requests,
+    )
+    options.update(overrides)
+    return uvicorn.Config(app, **options)
+
+
+def run_worker(app, sock, limit_max_requests):
+    import uvicorn
+    server = uvicorn.Server(uvicorn_config(app, limit_max_requests))
+    server.run(sockets=[sock])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--workers", type=int, default=WEB_CONCURRENCY)
+    parser.add_argument("--max-requests", type=int, default=MAX_REQUESTS, help="recycle a worker after this many requests, 0 never")
+    parser.add_argument("--max-requests-jitter", type=int, default=MAX_REQUESTS_JITTER, help="-1 for a tenth of --max-requests")
+    args = parser.parse_args()
+
+    if args.workers > 1 and not os.environ.get("METRICS_DIR"):
+        # read when the app is imported below, so every worker's shard lands in one place
+        os.environ["METRICS_DIR"] = tempfile.mkdtemp(prefix="cat-fact-metrics-")
+
+    # preload: import the app and build the OpenAPI cache once, before forking
+    from ..main import app
+    from ..utils.openapi_cache import openapi_cache
+    from ..sec import STRING_MIRROR_ENABLED
+    openapi_cache.build(app)
+    if args.workers > 1 and STRING_MIRROR_ENABLED:
+        logger.warning("STRING_MIRROR_ENABLED with %d workers: other workers' writes reach a mirror only when it is reloaded", args.workers)
+
+    if not hasattr(os, "fork"):
+        # no fork on this platform, uvicorn spawns its own workers and each imports the app again
+        import uvicorn
+        uvicorn.run(
+            "app.main:app", host=args.host, port=args.port, workers=args.workers, backlog=BACKLOG,
+            log_config=None, timeout_graceful_shutdown=GRACEFUL_TIMEOUT, limit_max_requests=args.max_requests or None
+        )
+        return 0
+
+    sock = bind_socket(args.host, args.port, BACKLOG)
+    return Supervisor(app, sock, args.workers, args.max_requests, args.max_requests_jitter).run()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,35 +1,17 @@
+import uuid
 from ..model.cat_fact_db import Users
 from fastapi import HTTPException, status
-from sqlmodel import select, func, and_
-from ..utils.add_user import encode_email_token, send_verification_email, decode_token, send_welcome_email
-from ..schema.add_user import MessageOut
+from sqlmodel import select, and_
+from sqlalchemy import case, exists, insert, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from ..model.cat_fact_db import EmailOutbox
+from ..utils.add_user import encode_email_token, build_verification_email, decode_token, build_welcome_email, parse_import_rows, validate_import_rows, consumed_tokens
+from ..schema.add_user import MessageOut, ImportRowResult, ImportReport
+from .email_outbox import queue_email, queue_email_for
 
-async def user_register(data, session, backgroundtask):
+async def user_register(data, session):
     try:
-        #avoid duplicate
-        statement = select(Users).where(Users.email == data.email)
-        result = await session.execute(statement)
-        user_email = result.scalars().first()
-        if user_email:
-            raise HTTPException(
-                status_code=status.HTTP_409_CONFLICT,
-                detail=f"Email {data.email} already registered"
-            )
-        # role auto seeding
-        statement_role = select(func.count()).select_from(Users)
-        result = await session.execute(statement_role)
-        user_role = result.scalar_one()
-        user_role = "superadmin" if user_role == 0 else "user"
-        #add user
-        new_user = Users(
-            email = data.email,
-            name = data.name,
-            stack = data.stack,
-            role = user_role
-        )
-        session.add(new_user)
-        await session.commit()
-        await session.refresh(new_user)
         first_name = data.name.split()[0] if data.name and data.name.strip() else data.name
         payload = {
             "email": data.email,
@@ -37,12 +19,29 @@ async def user_register(data, session, backgroundtask):
             "type": "email_verification"
         }
         email_token = await encode_email_token(payload)
-        backgroundtask.add_task(
-            send_verification_email,
+        message = build_verification_email(
             email=data.email,
             token=email_token,
             username=first_name
         )
+        # role auto seeding, the first user becomes superadmin; the EXISTS probe is served by
+        # the partial unique index on role = 'superadmin' so it does not grow with the table
+        role = case((exists().where(Users.role == "superadmin"), "user"), else_="superadmin")
+        try:
+            outbox_id = await _insert_user_with_email(data, role, message, session)
+        except IntegrityError as exc:
+            # a concurrent first signup took the superadmin row, register as a regular user
+            if "ux_users_single_superadmin" not in str(exc.orig):
+                raise
+            await session.rollback()
+            outbox_id = await _insert_user_with_email(data, "user", message, session)
+        #avoid duplicate
+        if outbox_id is None:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=f"Email {data.email} already registered"
+            )
+        await session.commit()
         response = f"Account successfully registered, Kindly check {data.email} inbox or spam folder to verify your account"
         return MessageOut(message=response)
     except HTTPException as Httpexc:
@@ -55,7 +54,30 @@ async def user_register(data, session, backgroundtask):
             detail=f"Failed to register user: {str(e)}"
         )
 
-async def verify_user(token, backgroundtask, session):
+async def _insert_user_with_email(data, role, message, session):
+    """
+    Insert the user and queue its verification email in one statement
+    - ON CONFLICT (email) DO NOTHING handles duplicates, in which case no email is queued
+    - Returns:
+        - the outbox id, or None when the email is already registered
+    """
+    new_user = (
+        pg_insert(Users)
+        .values(
+            id=str(uuid.uuid4()),
+            email=data.email,
+            name=data.name,
+            stack=data.stack,
+            role=role
+        )
+        .on_conflict_do_nothing(index_elements=[Users.email])
+        .returning(Users.id)
+        .cte("new_user")
+    )
+    result = await session.execute(queue_email_for(new_user, message))
+    return result.scalar_one_or_none()
+
+async def verify_user(token, session):
     try:
         payload = await decode_token(token)
         user_type = payload.get("type")
@@ -67,39 +89,35 @@ async def verify_user(token, backgroundtask, session):
             return MessageOut(
                 message=response
             )
-        statement = select(Users).where(and_(Users.email == email, Users.name == user_name))
-        result = await session.execute(statement)
-        user = result.scalars().first()
-        #security setup
-        if not user:
-            raise HTTPException(
-                status_code=status.HTTP_202_ACCEPTED,
-                detail= "Email verified successfully! you can Check your mail for the next steps."
-            )
-        if not user.is_active:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Inactive user, contact support"
-            )
-        if user.verify:
+        jti = payload.get("jti")
+        # replayed link, rejected without touching the database
+        if jti and jti in consumed_tokens:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Email already verified"
             )
+        # verify user, only flips an active and still unverified account
+        statement = (
+            update(Users)
+            .where(and_(Users.email == email, Users.name == user_name, Users.verify.is_(False), Users.is_active.is_(True)))
+            .values(verify=True)
+            .returning(Users.id, Users.email, Users.name)
+            .execution_options(synchronize_session=False)
+        )
+        result = await session.execute(statement)
+        user = result.first()
+        if not user:
+            await _raise_verify_failure(email, user_name, jti, payload.get("exp"), session)
         first_name = user.name.split()[0] if user.name and user.name.strip() else user.name
-        # verify user
-        user.verify = True
-        # save to db
-        await session.commit()
-        await session.refresh(user)
-        
-        # send welcome email
-        backgroundtask.add_task(
-            send_welcome_email,
+        # welcome email is committed with the verification, the outbox relay sends it
+        queue_email(session, build_welcome_email(
             email=user.email,
             username=first_name,
             user_id=user.id
-        )
+        ))
+        # save to db
+        await session.commit()
+        consumed_tokens.add(jti, payload.get("exp"))
         response = "Email verified successfully! Check your mail for the next steps."
         return MessageOut(
             message=response
@@ -114,7 +132,31 @@ async def verify_user(token, backgroundtask, session):
             detail=f"Failed: {str(e)}"
         )
 
-async def resend_email_verification(data, session, backgroundtask):
+async def _raise_verify_failure(email, user_name, jti, exp, session):
+    """
+    Slow path when the conditional update matched nothing, looks the user up to pick the response
+    """
+    statement = select(Users).where(and_(Users.email == email, Users.name == user_name))
+    result = await session.execute(statement)
+    user = result.scalars().first()
+    #security setup
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_202_ACCEPTED,
+            detail= "Email verified successfully! you can Check your mail for the next steps."
+        )
+    if not user.is_active:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Inactive user, contact support"
+        )
+    consumed_tokens.add(jti, exp)
+    raise HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail="Email already verified"
+    )
+
+async def resend_email_verification(data, session):
     try:
         #check if user exist
         statement = select(Users).where(Users.email == data.email)
@@ -141,12 +183,12 @@ async def resend_email_verification(data, session, backgroundtask):
             "type": "email_verification"
         }
         email_token = await encode_email_token(payload)
-        backgroundtask.add_task(
-            send_verification_email,
+        queue_email(session, build_verification_email(
             email=user.email,
             token=email_token,
             username=first_name
-        )
+        ))
+        await session.commit()
         response = f"Verification email resent, Kindly check {data.email} inbox or spam folder to verify your account"
         return MessageOut(message=response)
     except HTTPException as Httpexc:
@@ -157,4 +199,82 @@ async def resend_email_verification(data, session, backgroundtask):
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed: {str(e)}"
-        )  
\ No newline at end of file
+        )
+
+
+#rows inserted per statement and transaction by the bulk import
+IMPORT_CHUNK = 500
+
+async def bulk_import_users(raw, fmt, session):
+    """
+    Bulk user import from CSV or NDJSON
+    - rows are validated with the Register rules, inserted with multi-row INSERT ... ON CONFLICT (email) DO NOTHING
+      and their verification emails queued in the outbox in the same transaction, one transaction per chunk
+    - imported users always get the "user" role
+    - Returns:
+        - ImportReport with one result per input row
+    """
+    try:
+        parsed = parse_import_rows(raw, fmt)
+        results = {}
+        records = []
+        numbers = []
+        for number, record, error in parsed:
+            if error is not None:
+                results[number] = ImportRowResult(row=number, status="invalid", detail=error)
+            else:
+                numbers.append(number)
+                records.append(record)
+        valid, errors = validate_import_rows(records)
+        for index, detail in errors.items():
+            results[numbers[index]] = ImportRowResult(row=numbers[index], email=records[index].get("email"), status="invalid", detail=detail)
+        # first occurrence of an email in the file wins
+        pending = {}
+        for index, user in valid:
+            if user.email in pending:
+                results[numbers[index]] = ImportRowResult(row=numbers[index], email=user.email, status="duplicate", detail="email repeated in file")
+            else:
+                pending[user.email] = (numbers[index], user)
+        items = list(pending.values())
+        for start in range(0, len(items), IMPORT_CHUNK):
+            chunk = items[start:start + IMPORT_CHUNK]
+            statement = (
+                pg_insert(Users)
+                .values([
+                    {"id": str(uuid.uuid4()), "email": user.email, "name": user.name, "stack": user.stack, "role": "user"}
+                    for _, user in chunk
+                ])
+                .on_conflict_do_nothing(index_elements=[Users.email])
+                .returning(Users.email)
+            )
+            result = await session.execute(statement)
+            created = set(result.scalars().all())
+            outbox_rows = []
+            for number, user in chunk:
+                if user.email not in created:
+                    results[number] = ImportRowResult(row=number, email=user.email, status="duplicate", detail="email already registered")
+                    continue
+                token = await encode_email_token({"email": user.email, "name": user.name, "type": "email_verification"})
+                message = build_verification_email(email=user.email, token=token, username=user.name.split()[0])
+                outbox_rows.append({"recipient": message.to, "subject": message.subject, "html": message.html})
+                results[number] = ImportRowResult(row=number, email=user.email, status="created")
+            if outbox_rows:
+                await session.execute(insert(EmailOutbox).values(outbox_rows))
+            await session.commit()
+        ordered = [results[number] for number in sorted(results)]
+        return ImportReport(
+            total = len(ordered),
+            created = sum(1 for r in ordered if r.status == "created"),
+            duplicates = sum(1 for r in ordered if r.status == "duplicate"),
+            invalid = sum(1 for r in ordered if r.status == "invalid"),
+            results = ordered
+        )
+    except HTTPException as Httpexc:
+        await session.rollback()
+        raise Httpexc
+    except Exception as e:
+        await session.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to import users: {str(e)}"
+        )
@@ -0,0 +1,125 @@
+from ..model.cat_fact_db import EmailOutbox
+from sqlmodel import select, func, and_
+from sqlalchemy import text, insert, literal, update, delete
+from datetime import datetime, timedelta, timezone
+from ..utils.server_timing import timed
+
+@timed("email")
+def queue_email(session, message):
+    """
+    Add an outbox row to the caller's session, it is committed together with the user change
+    - Args:
+        - message: EmailMessage to deliver
+    """
+    session.add(EmailOutbox(
+        recipient=message.to,
+        subject=message.subject,
+        html=message.html
+    ))
+
+
+def queue_email_for(source, message):
+    """
+    INSERT ... SELECT that queues message once per row of source, a data modifying CTE
+    such as INSERT ... RETURNING, so the email only exists if the source row was written
+    """
+    return (
+        insert(EmailOutbox)
+        .from_select(
+            ["recipient", "subject", "html"],
+            select(literal(message.to), literal(message.subject), literal(message.html)).select_from(source)
+        )
+        .add_cte(source)
+        .returning(EmailOutbox.id)
+    )
+
+
+async def claim_outbox_batch(session, limit, lease_seconds):
+    """
+    Lease up to limit due rows and count the attempt, rows locked by another relay are skipped.
+    The caller commits right away; the rows stay pending but are not due again until the lease
+    runs out, so a relay that dies mid send hands its rows back on its own
+    - Returns: id, recipient, subject, html and attempts of every claimed row
+    """
+    due = (
+        select(EmailOutbox.id)
+        .where(and_(EmailOutbox.status == "pending", EmailOutbox.available_at <= func.now()))
+        .order_by(EmailOutbox.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+    )
+    statement = (
+        update(EmailOutbox)
+        .where(EmailOutbox.id.in_(due))
+        .values(available_at=func.now() + timedelta(seconds=lease_seconds), attempts=EmailOutbox.attempts + 1)
+        .returning(EmailOutbox.id, EmailOutbox.recipient, EmailOutbox.subject, EmailOutbox.html, EmailOutbox.attempts)
+        .execution_options(synchronize_session=False)
+    )
+    result = await session.execute(statement)
+    return result.all()
+
+
+async def record_outbox_results(session, rows, errors, max_attempts, backoff):
+    """
+    Record the outcome of a send attempt on claimed rows, sent rows drop their html
+    since it carries live verification tokens
+    - Args:
+        - errors: mapping of outbox id to the exception raised for that row
+        - backoff: callable giving the retry delay in seconds for an attempt number
+    - Returns: the number of rows given up on after max_attempts
+    """
+    now = datetime.now(timezone.utc)
+    sent, unsent = [], []
+    for row in rows:
+        error = errors.get(row.id)
+        if error is None:
+            sent.append({"id": row.id, "status": "sent", "sent_at": now, "last_error": None, "html": ""})
+        elif row.attempts >= max_attempts:
+            unsent.append({"id": row.id, "status": "failed", "available_at": now, "last_error": str(error)[:1000]})
+        else:
+            unsent.append({"id": row.id, "status": "pending", "available_at": now + timedelta(seconds=backoff(row.attempts)),
+                           "last_error": str(error)[:1000]})
+    # bulk UPDATE by primary key, one executemany per shape
+    for params in (sent, unsent):
+        if params:
+            await session.execute(update(EmailOutbox), params)
+    return sum(1 for params in unsent if params["status"] == "failed")
+
+
+async def purge_outbox(session, retention_seconds, limit):
+    """
+    Delete up to limit sent or failed rows older than retention_seconds
+    - Returns: the number of rows deleted
+    """
+    expired = (
+        select(EmailOutbox.id)
+        .where(and_(EmailOutbox.status.in_(("sent", "failed")), EmailOutbox.created_at < func.now() - timedelta(seconds=retention_seconds)))
+        .limit(limit)
+        .scalar_subquery()
+    )
+    result = await session.execute(delete(EmailOutbox).where(EmailOutbox.id.in_(expired)).execution_options(synchronize_session=False))
+    return result.rowcount
+
+
+async def outbox_metrics(session, window_seconds=60):
+    """
+    Lag and throughput of the outbox, computed from the table so every relay process is counted
+    """
+    pending = EmailOutbox.status == "pending"
+    statement = select(
+        func.count().filter(pending),
+        func.extract("epoch", func.now() - func.min(EmailOutbox.created_at).filter(pending)),
+        func.count().filter(and_(EmailOutbox.status == "sent", EmailOutbox.sent_at > func.now() - text(f"interval '{int(window_seconds)} seconds'"))),
+        func.count().filter(EmailOutbox.status == "failed")
+    )
+    result = await session.execute(statement)
+    pending_count, lag, sent_recent, failed = result.one()
+    return {
+        "pending": pending_count,
+        "lag_seconds": float(lag or 0.0),
+        "sent_last_window": sent_recent,
+        "window_seconds": window_seconds,
+        "throughput_per_second": sent_recent / window_seconds,
+        "failed": failed,
+    }
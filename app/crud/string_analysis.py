@@ -1,23 +1,156 @@
+import hashlib
 from fastapi import APIRouter, HTTPException, status, Depends
-from ..schema.string_analysis import StringFil, StringQuery, StringNat, StringAnaly
-from ..model.cat_fact_db import StringAnalysis
+from ..schema.string_analysis import StringFil, StringQuery, StringNat, StringAnaly, StringStatsOut, StringBulkDelete
+from ..model.cat_fact_db import StringAnalysis, StringStats, StringCharIndex
 from sqlmodel import select, and_, func, cast, Integer, Boolean, String
+from sqlalchemy import literal, delete
 from sqlalchemy.orm import defer
-from ..utils.string_analysis import interpret_natural_language_query
+from sqlalchemy import bindparam, any_
+from sqlalchemy.dialects.postgresql import insert as pg_insert, JSONB, ARRAY
+from ..utils.string_analysis import interpret_natural_language_query, string_stats_deltas, BULK_DELETE_CHUNK, BULK_DELETE_MAX_CHUNKS
 from fastapi_pagination.ext.sqlalchemy import paginate
+from ..utils.string_mirror import string_mirror
+from ..sec import STRING_MIRROR_ENABLED
 
-async def get_current_string(val, session):
+async def apply_string_stats(properties_list, sign, session):
+    """
+    Incrementally update the stringstats counters inside the caller's transaction
+    - Args:
+        - properties_list: properties of the inserted or deleted strings
+        - sign: 1 for inserts, -1 for deletes
+    """
+    deltas = string_stats_deltas(properties_list, sign)
+    if not deltas:
+        return
+    stmt = pg_insert(StringStats).values([
+        {"metric": metric, "bucket": bucket, "count": count}
+        for (metric, bucket), count in sorted(deltas.items())
+    ])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[StringStats.metric, StringStats.bucket],
+        set_={"count": StringStats.count + stmt.excluded.count}
+    )
+    await session.execute(stmt)
+
+
+async def index_string_characters(strings, session):
+    """
+    Add the posting list entries for newly analysed strings, reusing the
+    character_frequency_map already computed by create_with_hash
+    """
+    rows = [
+        {"char": char, "string_id": s.id}
+        for s in strings
+        for char in s.properties["character_frequency_map"]
+    ]
+    if rows:
+        await session.execute(pg_insert(StringCharIndex).values(rows).on_conflict_do_nothing())
+
+
+def contains_chars_filter(chars, match_all=True):
+    """
+    Filter on the character posting lists
+    - match_all: intersect the posting lists (contains all of), otherwise union them (contains any of)
+    """
+    chars = sorted(set(chars))
+    postings = select(StringCharIndex.string_id).where(StringCharIndex.char.in_(chars))
+    if match_all and len(chars) > 1:
+        postings = postings.group_by(StringCharIndex.string_id).having(func.count() == len(chars))
+    return StringAnalysis.id.in_(postings)
+
+
+def _validate_chars(chars):
+    #posting lists are keyed by single lowercase characters
+    if any(len(c) != 1 for c in chars):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail= "Invalid query parameter values or types"
+        )
+    return [c.lower() for c in chars]
+
+
+async def get_string_stats(session):
+    try:
+        result = await session.execute(select(StringStats.metric, StringStats.bucket, StringStats.count).where(StringStats.count > 0))
+        counters = {}
+        for metric, bucket, count in result.all():
+            counters.setdefault(metric, {})[bucket] = count
+        total = counters.get("total", {}).get("all", 0)
+        palindromes = counters.get("palindrome", {}).get("true", 0)
+        length_sum = counters.get("length_sum", {}).get("all", 0)
+        return StringStatsOut(
+            total = total,
+            palindrome_count = palindromes,
+            palindrome_ratio = palindromes / total if total else 0.0,
+            average_length = length_sum / total if total else 0.0,
+            length_histogram = dict(sorted(counters.get("length", {}).items(), key=lambda kv: int(kv[0].split("-")[0]))),
+            word_count_distribution = dict(sorted(counters.get("word_count", {}).items(), key=lambda kv: int(kv[0])))
+        )
+    except HTTPException as httpexc:
+        raise httpexc
+    except Exception as e:
+        raise e
+
+
+async def strings_generation(session):
+    """Write generation of the string table, one primary key lookup on stringstats"""
+    try:
+        result = await session.execute(
+            select(StringStats.count).where(StringStats.metric == "generation", StringStats.bucket == "all")
+        )
+        return result.scalar() or 0
+    except HTTPException as httpexc:
+        raise httpexc
+    except Exception as e:
+        raise e
+
+
+async def ensure_string_exists(val, session):
+    """Primary key existence check for conditional GETs, the id is the SHA-256 of the stored value"""
+    try:
+        string_id = hashlib.sha256(val.strip().lower().encode("utf-8")).hexdigest()
+        result = await session.execute(select(literal(1)).where(StringAnalysis.id == string_id))
+        if result.first() is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="string does not exist in the system"
+            )
+    except HTTPException as httpexc:
+        raise httpexc
+    except Exception as e:
+        raise e
+
+
+def string_columns(projection=None):
+    """
+    Columns for a string response
+    - projection: properties keys to keep, the JSONB object is rebuilt in postgres so dropped keys never leave the database
+    """
+    properties = StringAnalysis.properties
+    if projection is not None:
+        properties = func.jsonb_build_object(
+            *[arg for key in projection for arg in (literal(key), StringAnalysis.properties[key])],
+            type_=JSONB
+        )
+    return [StringAnalysis.id, StringAnalysis.value, properties.label("properties"), StringAnalysis.created_at]
+
+
+def _to_string_analy(rows):
+    return [StringAnaly(**row._mapping) for row in rows]
+
+
+async def get_current_string(val, session, projection=None):
     try:
         vals = val.strip().lower()
-        statement = select(StringAnalysis).options(defer(StringAnalysis.updated_at)).where(StringAnalysis.value == vals)
+        statement = select(*string_columns(projection)).where(StringAnalysis.value == vals)
         result = await session.execute(statement)
-        old_string = result.scalars().first()
+        old_string = result.first()
         if not old_string:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="string does not exist in the system"
             )
-        return old_string 
+        return StringAnaly(**old_string._mapping)
     except HTTPException as httpexc:
         raise httpexc
     except Exception as e:
@@ -26,20 +159,31 @@ async def get_current_string(val, session):
 
 
 async def create_single_string(val, session):
+    """
+    Three statements: INSERT ... ON CONFLICT DO NOTHING RETURNING doubles as the
+    existence check and the response row, then the posting lists and the stats
+    """
     try:
-        stmt = select(StringAnalysis).where(StringAnalysis.value == val.value)
+        new_string = StringAnalysis.create_with_hash(val.value)
+        stmt = (
+            pg_insert(StringAnalysis)
+            .values(id=new_string.id, value=new_string.value, properties=new_string.properties)
+            .on_conflict_do_nothing()
+            .returning(*string_columns())
+        )
         result = await session.execute(stmt)
-        old_string = result.scalars().first()
-        if old_string:
+        row = result.first()
+        if row is None:
             raise HTTPException(
                 status_code=status.HTTP_409_CONFLICT,
                 detail="String already exists in the system"
             )
-        new_string = StringAnalysis.create_with_hash(val.value) 
-        session.add(new_string)
+        await index_string_characters([new_string], session)
+        await apply_string_stats([new_string.properties], 1, session)
         await session.commit()
-        await session.refresh(new_string)
-        return await get_current_string(val.value, session)
+        if string_mirror.ready:
+            string_mirror.add(row.id, row.value, row.properties, row.created_at)
+        return StringAnaly(**row._mapping)
     except HTTPException as httpexc:
         await session.rollback()
         raise httpexc
@@ -47,10 +191,10 @@ async def create_single_string(val, session):
         await session.rollback()
         raise e
     
-async def all_single_string(params, session):
+async def all_single_string(params, session, projection=None):
     try:
-        stmt = select(StringAnalysis).options(defer(StringAnalysis.updated_at)).order_by(StringAnalysis.created_at.desc())
-        return await paginate(session, stmt, params)
+        stmt = select(*string_columns(projection)).order_by(StringAnalysis.created_at.desc())
+        return await paginate(session, stmt, params, transformer=_to_string_analy, unique=False)
     except HTTPException as httpexc:
         await session.rollback()
         raise httpexc
@@ -70,62 +214,88 @@ async def delete_single_string(string_value, session):
                 detail="string does not exist in the system"
             )
         await session.delete(old_string)
+        await apply_string_stats([old_string.properties], -1, session)
         await session.commit()
+        string_mirror.remove(old_string.id)
     except HTTPException as httpexc:
         raise httpexc
     except Exception as e:
         raise e
 
         
-async def all_string_fil(is_palindrome, min_length, max_length, word_count, contains_character, session):
-    try:
-        filters = []
-        # Filter by palindrome if specified
-        if is_palindrome is not None:
-            filters.append(cast(StringAnalysis.properties["is_palindrome"], Boolean) == is_palindrome)
-        # Filter by min_length if specified
-        if min_length is not None:
-            filters.append(cast(StringAnalysis.properties["length"], Integer) >= min_length)
-        # Filter by max_length if specified
-        if max_length is not None:
-            filters.append(cast(StringAnalysis.properties["length"], Integer) <= max_length)
-        # Filter by max_length if specified
-        if word_count is not None:
-            filters.append(cast(StringAnalysis.properties["word_count"], Integer) == word_count)
-        #filter by contains_character if specified
-        if contains_character is not None:
+def build_string_filters(is_palindrome, min_length, max_length, word_count, contains_character, contains_all=None, contains_any=None):
+    """
+    Translate the string filter query parameters into SQL conditions, shared by listing and bulk delete
+    - raises:
+        - HTTPException 400 when no filter is given
+    """
+    filters = []
+    # Filter by palindrome if specified
+    if is_palindrome is not None:
+        filters.append(cast(StringAnalysis.properties["is_palindrome"], Boolean) == is_palindrome)
+    # Filter by min_length if specified
+    if min_length is not None:
+        filters.append(cast(StringAnalysis.properties["length"], Integer) >= min_length)
+    # Filter by max_length if specified
+    if max_length is not None:
+        filters.append(cast(StringAnalysis.properties["length"], Integer) <= max_length)
+    # Filter by max_length if specified
+    if word_count is not None:
+        filters.append(cast(StringAnalysis.properties["word_count"], Integer) == word_count)
+    #filter by contains_character if specified, single characters are answered from the posting lists
+    if contains_character is not None:
+        if len(contains_character) == 1:
+            filters.append(contains_chars_filter([contains_character.lower()]))
+        else:
             filters.append(StringAnalysis.value.ilike(f"%{contains_character}%"))
-        if not filters:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail= "Invalid query parameter values or types"
-            )
-        #select matching fields
-        statement = select(StringAnalysis).options(defer(StringAnalysis.updated_at)).where(and_(*filters))
-        result = await session.execute(statement)
-        old_strings = result.scalars().all()
+    #filter by several required characters
+    if contains_all:
+        filters.append(contains_chars_filter(_validate_chars(contains_all), match_all=True))
+    if contains_any:
+        filters.append(contains_chars_filter(_validate_chars(contains_any), match_all=False))
+    if not filters:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail= "Invalid query parameter values or types"
+        )
+    return filters
 
-        stmt = select(func.count()).select_from(StringAnalysis).where(and_(*filters))
-        count_result = await session.execute(stmt)
-        result_count = count_result.scalar()
+
+async def all_string_fil(is_palindrome, min_length, max_length, word_count, contains_character, session, contains_all=None, contains_any=None, projection=None):
+    try:
+        filters = build_string_filters(is_palindrome, min_length, max_length, word_count, contains_character, contains_all, contains_any)
+        if string_mirror.ready:
+            #answer the filter from the in-memory mirror and only fetch matching rows by primary key
+            matched_ids = string_mirror.filter(is_palindrome, min_length, max_length, word_count, contains_character, contains_all, contains_any)
+            old_strings = []
+            if matched_ids:
+                statement = select(*string_columns(projection)).where(
+                    StringAnalysis.id == any_(bindparam("matched_ids", matched_ids, type_=ARRAY(String)))
+                )
+                result = await session.execute(statement)
+                old_strings = result.all()
+            result_count = len(old_strings)
+        else:
+            #select matching fields
+            statement = select(*string_columns(projection)).where(and_(*filters))
+            result = await session.execute(statement)
+            old_strings = result.all()
+
+            stmt = select(func.count()).select_from(StringAnalysis).where(and_(*filters))
+            count_result = await session.execute(stmt)
+            result_count = count_result.scalar()
 
         fil = StringQuery(
             is_palindrome = is_palindrome,
             min_length = min_length,
             max_length = max_length,
             word_count = word_count,
-            contains_character = contains_character
+            contains_character = contains_character,
+            contains_all = contains_all,
+            contains_any = contains_any
         )
 
-        filstring = [
-            StringAnaly(
-                id=s.id,
-                value=s.value,
-                properties=s.properties,
-                created_at=s.created_at
-            )
-            for s in old_strings
-        ]if old_strings else []
+        filstring = _to_string_analy(old_strings)
 
         filtered_result = StringFil(
             data = filstring,
@@ -138,7 +308,93 @@ async def all_string_fil(is_palindrome, min_length, max_length, word_count, cont
     except Exception as e:
         raise e
 
-async def natural_language_filtering(query, session):
+async def bulk_delete_strings(is_palindrome, min_length, max_length, word_count, contains_character, session, contains_all=None, contains_any=None, dry_run=False, chunk_size=BULK_DELETE_CHUNK):
+    """
+    Set based delete of every string matching the filters
+    - deletes in chunks of chunk_size rows, each chunk is its own short transaction
+    - stops after BULK_DELETE_MAX_CHUNKS chunks and reports complete=False when more may match
+    - dry_run only reports how many strings would be deleted
+    """
+    try:
+        filters = build_string_filters(is_palindrome, min_length, max_length, word_count, contains_character, contains_all, contains_any)
+        fil = StringQuery(
+            is_palindrome = is_palindrome,
+            min_length = min_length,
+            max_length = max_length,
+            word_count = word_count,
+            contains_character = contains_character,
+            contains_all = contains_all,
+            contains_any = contains_any
+        )
+        if dry_run:
+            stmt = select(func.count()).select_from(StringAnalysis).where(and_(*filters))
+            count_result = await session.execute(stmt)
+            return StringBulkDelete(
+                count = count_result.scalar(),
+                dry_run = True,
+                chunks = 0,
+                filters_applied = fil.model_dump(exclude_none=True)
+            )
+        deleted = 0
+        chunks = 0
+        complete = False
+        while chunks < BULK_DELETE_MAX_CHUNKS:
+            chunk_ids = select(StringAnalysis.id).where(and_(*filters)).limit(chunk_size).scalar_subquery()
+            stmt = (
+                delete(StringAnalysis)
+                .where(StringAnalysis.id.in_(chunk_ids))
+                .returning(StringAnalysis.id, StringAnalysis.properties)
+                .execution_options(synchronize_session=False)
+            )
+            result = await session.execute(stmt)
+            removed = result.all()
+            if not removed:
+                complete = True
+                break
+            await apply_string_stats([row.properties for row in removed], -1, session)
+            await session.commit()
+            for row in removed:
+                string_mirror.remove(row.id)
+            deleted += len(removed)
+            chunks += 1
+            if len(removed) < chunk_size:
+                complete = True
+                break
+        return StringBulkDelete(
+            count = deleted,
+            dry_run = False,
+            chunks = chunks,
+            complete = complete,
+            filters_applied = fil.model_dump(exclude_none=True)
+        )
+    except HTTPException as httpexc:
+        await session.rollback()
+        raise httpexc
+    except Exception as e:
+        await session.rollback()
+        raise e
+
+
+async def warm_string_mirror(session):
+    """Populate the in-memory mirror when STRING_MIRROR_ENABLED is set"""
+    if not STRING_MIRROR_ENABLED:
+        return 0
+    return await string_mirror.warm(session)
+
+
+async def string_mirror_report(check, session):
+    try:
+        report = {"enabled": STRING_MIRROR_ENABLED, **string_mirror.memory_report()}
+        if check and string_mirror.ready:
+            report["consistency"] = await string_mirror.consistency_check(session)
+        return report
+    except HTTPException as httpexc:
+        raise httpexc
+    except Exception as e:
+        raise e
+
+
+async def natural_language_filtering(query, session, projection=None):
     try:
         parsed_filters = await interpret_natural_language_query(query)
         if not parsed_filters:
@@ -152,7 +408,10 @@ async def natural_language_filtering(query, session):
                 max_length=parsed_filters.get("max_length"),
                 word_count=parsed_filters.get("word_count"),
                 contains_character=parsed_filters.get("contains_character"),
-                session=session
+                session=session,
+                contains_all=parsed_filters.get("contains_all"),
+                contains_any=parsed_filters.get("contains_any"),
+                projection=projection
             )
         return StringNat(
                 data = result.data,
@@ -1,5 +1,6 @@
 from .sec import DATABASE_URL
 from .utils.database import normalize_url
+from .utils.db_instrumentation import install_db_instrumentation
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 from sqlmodel import SQLModel
@@ -13,6 +14,8 @@ engine = create_async_engine(
     echo=False,
     future=True
 )
+#statement counts and durations for /metrics
+install_db_instrumentation(engine)
 #async session maker
 async_session = async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
 
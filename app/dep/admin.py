@@ -0,0 +1,16 @@
+import hmac
+from typing import Optional
+from fastapi import Header, HTTPException, status
+from ..sec import ADMIN_TOKEN
+
+async def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """
+    Dependency guarding admin endpoints
+    - raises:
+        - HTTPException 403 when ADMIN_TOKEN is unset or the X-Admin-Token header does not match
+    """
+    if not ADMIN_TOKEN or not x_admin_token or not hmac.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required"
+        )
@@ -1,25 +1,50 @@
 #importing the necessary requirements
 from fastapi import FastAPI
 from contextlib import asynccontextmanager
-from .database_setup import init_db
+from .database_setup import init_db, async_session, engine
+from .crud.string_analysis import warm_string_mirror
+from .utils.email_outbox import outbox_relay, OUTBOX_RELAY_IN_APP
 from .setup_main import configure_cors, register_exception_handlers
-from .middleware import LoggingMiddleware
+from .middleware import LoggingMiddleware, MetricsMiddleware, QueryBudgetMiddleware, AdmissionControlMiddleware, ADMISSION_CONTROL_ENABLED
+from .utils.metrics import metrics_exporter
+from .utils.server_timing import ServerTimingMiddleware, SERVER_TIMING_ENABLED
+from .utils.profiling import ProfilingMiddleware, PROFILING_ENABLED
+from .utils.compression import CompressionMiddleware, COMPRESSION_ENABLED
+from .utils.startup import warmup
+from .utils.warmer import background_warmer, WARMER_ENABLED
 from fastapi_pagination import add_pagination
 
 #importing router
-from .routers import cat_fact, add_user, root, keep_alive, string_analysis
+from .routers import cat_fact, add_user, root, keep_alive, string_analysis, metrics, profiling, docs, health
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    metrics_exporter.start()
     await init_db()
+    async with async_session() as session:
+        await warm_string_mirror(session)
+    if OUTBOX_RELAY_IN_APP:
+        outbox_relay.start()
+    # connections, upstream and the OpenAPI cache are primed before the server accepts requests
+    await warmup(app, engine)
+    # keeps them warm from here on and caches dependency status for the health routes
+    if WARMER_ENABLED:
+        background_warmer.start()
     yield
+    await background_warmer.stop()
+    await outbox_relay.stop()
+    await metrics_exporter.stop()
 
 #calling an instance of fast api
 app = FastAPI(
     title="CAT FACT API",
     description="Random Cat Fact Application",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    # served from the precomputed cache in routers/docs.py instead
+    openapi_url=None,
+    docs_url=None,
+    redoc_url=None
 )
 
 #defining the cors function and any other custom middleware
@@ -28,6 +53,28 @@ configure_cors(app)
 #handling validation error
 register_exception_handlers(app)
 
+# per request statement counts, innermost so only admitted requests are counted
+app.add_middleware(QueryBudgetMiddleware)
+
+# gzip / brotli, inside timing, metrics and admission so compression counts towards the request
+if COMPRESSION_ENABLED:
+    app.add_middleware(CompressionMiddleware)
+
+# on demand profiling, neither the middleware nor its routes exist when disabled
+if PROFILING_ENABLED:
+    app.add_middleware(ProfilingMiddleware)
+
+# Add admission control inside the logging middleware so shed requests are logged
+if ADMISSION_CONTROL_ENABLED:
+    app.add_middleware(AdmissionControlMiddleware)
+
+# Add metrics outside admission control so 503 sheds are counted
+app.add_middleware(MetricsMiddleware)
+
+# Server-Timing breakdown, not installed at all when disabled
+if SERVER_TIMING_ENABLED:
+    app.add_middleware(ServerTimingMiddleware)
+
 # Add logging middleware
 app.add_middleware(LoggingMiddleware)
 
@@ -37,6 +84,11 @@ app.include_router(add_user.router)
 app.include_router(root.router)
 app.include_router(keep_alive.router)
 app.include_router(string_analysis.router)
+app.include_router(metrics.router)
+app.include_router(docs.router)
+app.include_router(health.router)
+if PROFILING_ENABLED:
+    app.include_router(profiling.router)
 
 #adding pagination to the app
 add_pagination(app)
\ No newline at end of file
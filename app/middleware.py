@@ -1,44 +1,355 @@
 # app/middleware.py
+import asyncio
+import json
 import logging
+import math
 import time
-from fastapi import Request
-from starlette.middleware.base import BaseHTTPMiddleware
+import uuid
+from collections import deque
+from dataclasses import dataclass
+from typing import Optional, Tuple
+from decouple import config
+from .utils.logging_setup import request_id_var
+from .utils.db_instrumentation import begin_request, end_request
+from .utils.metrics import (
+    registry, Counter, Gauge, HTTP_REQUEST_DURATION, HTTP_REQUESTS, HTTP_IN_FLIGHT,
+    DB_QUERIES_PER_REQUEST,
+)
 
 logger = logging.getLogger(__name__)
 
 
-class LoggingMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        if request.url.path in ["/docs", "/redoc", "/openapi.json", "/favicon.ico"]:
-            return await call_next(request)
-        
-        start_time = time.time()
-        
-        # Log request with body for POST/PUT
-        if request.method in ["POST", "PUT", "PATCH"]:
+#paths that are never logged, checked once per request against a precomputed set
+EXCLUDED_PATHS = frozenset({"/docs", "/redoc", "/openapi.json", "/favicon.ico", "/metrics", "/healthz", "/readyz"})
+BODY_METHODS = frozenset({"POST", "PUT", "PATCH"})
+
+
+def _content_length(scope) -> Optional[int]:
+    for name, value in scope["headers"]:
+        if name == b"content-length":
             try:
-                body = await request.body()
-                logger.info(f"{request.method} {request.url.path} (body size: {len(body)} bytes)")
-            except:
-                logger.info(f"{request.method} {request.url.path}")
+                return int(value)
+            except ValueError:
+                return None
+    return None
+
+
+def _request_id(scope) -> str:
+    # reuse the caller's id when it is sane, otherwise mint one
+    for name, value in scope["headers"]:
+        if name == b"x-request-id":
+            if 0 < len(value) <= 128 and value.isascii() and value.decode().isprintable():
+                return value.decode()
+            break
+    return uuid.uuid4().hex
+
+
+class LoggingMiddleware:
+    """
+    Pure ASGI request logging, the body is never buffered; its size comes from
+    Content-Length or is counted as the chunks stream past to the app.
+    Every record logged while the request runs carries its X-Request-ID
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in EXCLUDED_PATHS:
+            return await self.app(scope, receive, send)
+
+        method = scope["method"]
+        path = scope["path"]
+        request_id = _request_id(scope)
+        token = request_id_var.set(request_id)
+        start_time = time.perf_counter()
+        status_code = 500
+        streamed = None
+
+        # Log request with body size for POST/PUT/PATCH
+        if method in BODY_METHODS:
+            size = _content_length(scope)
+            if size is not None:
+                logger.info("%s %s (body size: %d bytes)", method, path, size)
+            else:
+                streamed = 0
+                logger.info("%s %s (body size: streamed)", method, path)
+                inner_receive = receive
+
+                async def receive():
+                    nonlocal streamed
+                    message = await inner_receive()
+                    if message["type"] == "http.request":
+                        streamed += len(message.get("body", b""))
+                    return message
         else:
-            logger.info(f"{request.method} {request.url.path}")
-        
+            logger.info("%s %s", method, path)
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                message["headers"] = [*message.get("headers", ()), (b"x-request-id", request_id.encode())]
+            await send(message)
+
         try:
-            response = await call_next(request)
-            duration = time.time() - start_time
-            
+            await self.app(scope, receive, send_wrapper)
+        except Exception as e:
+            duration = time.perf_counter() - start_time
+            logger.error("%s %s FAILED after %.3fs: %s", method, path, duration, e)
+            raise
+        else:
+            duration = time.perf_counter() - start_time
             # Different log levels based on status
-            if response.status_code >= 500:
-                logger.error(f"{request.method} {request.url.path} [{response.status_code}] {duration:.3f}s")
-            elif response.status_code >= 400:
-                logger.warning(f"{request.method} {request.url.path} [{response.status_code}] {duration:.3f}s")
+            if status_code >= 500:
+                level = logging.ERROR
+            elif status_code >= 400:
+                level = logging.WARNING
             else:
-                logger.info(f"{request.method} {request.url.path} [{response.status_code}] {duration:.3f}s")
-            
-            return response
-            
-        except Exception as e:
-            duration = time.time() - start_time
-            logger.error(f"{request.method} {request.url.path} FAILED after {duration:.3f}s: {str(e)}")
-            raise
\ No newline at end of file
+                level = logging.INFO
+            fields = {"method": method, "path": path, "status": status_code, "duration_ms": round(duration * 1000, 3)}
+            if streamed is not None:
+                fields["body_bytes"] = streamed
+            logger.log(level, "%s %s [%d] %.3fs", method, path, status_code, duration, extra=fields)
+        finally:
+            request_id_var.reset(token)
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI request metrics labelled by route template, so /strings/{string_value}
+    is one series whatever the value
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        method = scope["method"]
+        status_code = 500
+        start_time = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            # the router writes the matched route into the shared scope
+            route = scope.get("route")
+            template = getattr(route, "path", None) or "unmatched"
+            HTTP_REQUEST_DURATION.observe(time.perf_counter() - start_time, (method, template))
+            HTTP_REQUESTS.inc((method, template, str(status_code)))
+
+
+class QueryBudgetMiddleware:
+    """
+    Counts the statements each request issues and warns when a route declared
+    with @query_budget goes over it; QUERY_BUDGET_STRICT fails the query instead
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        state, token = begin_request(scope)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            end_request(token)
+            if scope.get("route") is not None:
+                DB_QUERIES_PER_REQUEST.observe(state.count, (state.route,))
+            budget = state.budget
+            if budget is not None and state.count > budget:
+                logger.warning(
+                    "%s %s issued %d queries, budget is %d", scope["method"], state.route, state.count, budget,
+                    extra={"route": state.route, "queries": state.count, "query_budget": budget}
+                )
+
+
+# admission control, pools of weighted concurrency with bounded wait queues
+ADMISSION_CONTROL_ENABLED = config("ADMISSION_CONTROL_ENABLED", default=True, cast=bool)
+# {"name": {"capacity": units, "max_queue": waiters, "timeout": seconds}}
+ADMISSION_POOLS = json.loads(config("ADMISSION_POOLS", default=json.dumps({
+    "default": {"capacity": 64, "max_queue": 128, "timeout": 5.0},
+    "strings_write": {"capacity": 16, "max_queue": 32, "timeout": 5.0},
+})))
+# first matching rule wins, weight 0 bypasses admission entirely
+ADMISSION_RULES = json.loads(config("ADMISSION_RULES", default=json.dumps([
+    {"methods": ["GET", "HEAD"], "path": "/", "exact": True, "weight": 0},
+    {"methods": ["GET", "HEAD"], "path": "/internal", "weight": 0},
+    {"methods": ["GET"], "path": "/metrics", "exact": True, "weight": 0},
+    {"methods": ["GET", "HEAD"], "path": "/healthz", "exact": True, "weight": 0},
+    {"methods": ["GET", "HEAD"], "path": "/readyz", "exact": True, "weight": 0},
+    {"methods": ["POST", "DELETE"], "path": "/strings", "pool": "strings_write", "weight": 4},
+    {"methods": ["POST"], "path": "/user", "weight": 2},
+])))
+
+
+class AdmissionPool:
+    def __init__(self, name: str, capacity: int, max_queue: int, timeout: float):
+        self.name = name
+        self.capacity = capacity
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.in_use = 0
+        self.waiters = deque()
+        self.admitted = 0
+        self.shed = 0
+        self.timed_out = 0
+
+    def _wake(self):
+        while self.waiters and self.in_use + self.waiters[0][0] <= self.capacity:
+            weight, fut = self.waiters.popleft()
+            if not fut.done():
+                self.in_use += weight
+                fut.set_result(True)
+
+    def _expire(self, entry):
+        weight, fut = entry
+        if not fut.done():
+            self.waiters.remove(entry)
+            self.timed_out += 1
+            fut.set_result(False)
+            self._wake()
+
+    async def acquire(self, weight: int) -> bool:
+        """Take weight units, waiting in the bounded queue; False means the request must be shed"""
+        weight = min(weight, self.capacity)
+        if not self.waiters and self.in_use + weight <= self.capacity:
+            self.in_use += weight
+            self.admitted += 1
+            return True
+        if len(self.waiters) >= self.max_queue:
+            self.shed += 1
+            return False
+        loop = asyncio.get_running_loop()
+        entry = (weight, loop.create_future())
+        self.waiters.append(entry)
+        handle = loop.call_later(self.timeout, self._expire, entry)
+        try:
+            granted = await entry[1]
+        except asyncio.CancelledError:
+            # client went away while queued
+            if entry[1].done() and not entry[1].cancelled() and entry[1].result():
+                self.release(weight)
+            elif entry in self.waiters:
+                self.waiters.remove(entry)
+                self._wake()
+            raise
+        finally:
+            handle.cancel()
+        if granted:
+            self.admitted += 1
+        else:
+            self.shed += 1
+        return granted
+
+    def release(self, weight: int):
+        self.in_use -= min(weight, self.capacity)
+        self._wake()
+
+    def snapshot(self):
+        return {
+            "capacity": self.capacity,
+            "in_use": self.in_use,
+            "queue_depth": len(self.waiters),
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "shed": self.shed,
+            "timed_out": self.timed_out,
+        }
+
+
+@dataclass
+class AdmissionRule:
+    path: str
+    methods: Tuple[str, ...] = ()
+    exact: bool = False
+    pool: str = "default"
+    weight: int = 1
+
+    def matches(self, method: str, path: str) -> bool:
+        if self.methods and method not in self.methods:
+            return False
+        if self.exact:
+            return path == self.path
+        return path == self.path or path.startswith(self.path.rstrip("/") + "/")
+
+
+class AdmissionController:
+    def __init__(self, pools=ADMISSION_POOLS, rules=ADMISSION_RULES):
+        self.pools = {name: AdmissionPool(name, **spec) for name, spec in pools.items()}
+        self.rules = [AdmissionRule(**{**rule, "methods": tuple(rule.get("methods", ()))}) for rule in rules]
+
+    def classify(self, method: str, path: str) -> Tuple[Optional[AdmissionPool], int]:
+        for rule in self.rules:
+            if rule.matches(method, path):
+                return (self.pools[rule.pool] if rule.weight else None), rule.weight
+        return self.pools["default"], 1
+
+    def snapshot(self):
+        return {name: pool.snapshot() for name, pool in self.pools.items()}
+
+
+#process wide controller, read by the /internal/admission endpoint
+admission_controller = AdmissionController()
+
+ADMISSION_IN_USE = registry.register(Gauge(
+    "admission_in_use_units", "Admission units currently held", ("pool",)))
+ADMISSION_QUEUE_DEPTH = registry.register(Gauge(
+    "admission_queue_depth", "Requests waiting for admission", ("pool",)))
+ADMISSION_SHED = registry.register(Counter(
+    "admission_shed_total", "Requests rejected with 503, full queue or queue timeout", ("pool",)))
+
+
+def _collect_admission():
+    for name, snap in admission_controller.snapshot().items():
+        ADMISSION_IN_USE.set(snap["in_use"], (name,))
+        ADMISSION_QUEUE_DEPTH.set(snap["queue_depth"], (name,))
+        # shed already counts queue timeouts, timed_out is the subset
+        ADMISSION_SHED.set_total(snap["shed"], (name,))
+
+
+registry.add_collector(_collect_admission)
+
+
+class AdmissionControlMiddleware:
+    """Pure ASGI middleware that sheds load with 503 and Retry-After once a pool and its queue are full"""
+    def __init__(self, app, controller: AdmissionController = admission_controller):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        pool, weight = self.controller.classify(scope["method"], scope["path"])
+        if pool is None:
+            return await self.app(scope, receive, send)
+        if not await pool.acquire(weight):
+            return await self._shed(pool, send)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            pool.release(weight)
+
+    async def _shed(self, pool: AdmissionPool, send):
+        body = json.dumps({"detail": "Server is busy, please retry later"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(max(1, math.ceil(pool.timeout))).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
\ No newline at end of file
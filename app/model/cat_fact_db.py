@@ -2,12 +2,16 @@ import uuid
 from sqlmodel import SQLModel, Field, Column
 from datetime import datetime
 from pydantic import EmailStr
-from sqlalchemy import String, func, DateTime, Boolean, text, JSON
-from typing import Dict
+from sqlalchemy import String, func, DateTime, Boolean, text, JSON, BigInteger, ForeignKey, Integer, Text, Index
+from typing import Dict, Optional
 import hashlib
 from sqlalchemy.dialects.postgresql import JSONB
 
 class Users(SQLModel, table=True):
+    # at most one superadmin, enforced by the database so concurrent first signups cannot both win
+    __table_args__ = (
+        Index("ux_users_single_superadmin", "role", unique=True, postgresql_where=text("role = 'superadmin'")),
+    )
     id: str = Field(
     default_factory=lambda: str(uuid.uuid4()),
     sa_column=Column(String(36), primary_key=True, nullable=False)
@@ -68,4 +72,47 @@ class StringAnalysis(SQLModel, table=True):
         freq_map = {}
         for char in text:
             freq_map[char] = freq_map.get(char, 0) + 1
-        return freq_map
\ No newline at end of file
+        return freq_map
+
+class StringStats(SQLModel, table=True):
+    # incremental aggregate counters for string analysis, one row per (metric, bucket)
+    metric: str = Field(
+        sa_column=Column(String(32), primary_key=True, nullable=False)
+    )
+    bucket: str = Field(
+        sa_column=Column(String(32), primary_key=True, nullable=False)
+    )
+    count: int = Field(default=0, sa_column=Column(BigInteger, nullable=False, server_default=text("0")))
+
+
+
+class StringCharIndex(SQLModel, table=True):
+    # inverted index, posting lists from a character to the strings containing it
+    char: str = Field(
+        sa_column=Column(String(8), primary_key=True, nullable=False)
+    )
+    string_id: str = Field(
+        sa_column=Column(String(64), ForeignKey("stringanalysis.id", ondelete="CASCADE"), primary_key=True, nullable=False, index=True)
+    )
+
+
+class EmailOutbox(SQLModel, table=True):
+    # transactional outbox, rows are written with the user change and drained by the relay
+    __tablename__ = "email_outbox"
+    __table_args__ = (
+        Index("ix_email_outbox_pending", "available_at", postgresql_where=text("status = 'pending'")),
+    )
+    id: Optional[int] = Field(
+        default=None,
+        sa_column=Column(BigInteger, primary_key=True, autoincrement=True)
+    )
+    recipient: str = Field(sa_column=Column(String, nullable=False))
+    subject: str = Field(sa_column=Column(String, nullable=False))
+    # emptied once sent, it carries verification tokens
+    html: str = Field(sa_column=Column(Text, nullable=False))
+    status: str = Field(default="pending", sa_column=Column(String(16), nullable=False, server_default=text("'pending'"), index=True))
+    attempts: int = Field(default=0, sa_column=Column(Integer, nullable=False, server_default=text("0")))
+    last_error: Optional[str] = Field(default=None, sa_column=Column(Text, nullable=True))
+    created_at: datetime = Field(sa_column=Column(DateTime(timezone=True), server_default=func.now(), nullable=False))
+    available_at: datetime = Field(sa_column=Column(DateTime(timezone=True), server_default=func.now(), nullable=False))
+    sent_at: Optional[datetime] = Field(default=None, sa_column=Column(DateTime(timezone=True), nullable=True))
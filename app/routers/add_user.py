@@ -1,26 +1,27 @@
-from fastapi import APIRouter, HTTPException, status, Depends, BackgroundTasks
-from ..schema.add_user import Register, MessageOut, Resend
-from ..crud.add_user import user_register, verify_user, resend_email_verification
+from fastapi import APIRouter, HTTPException, status, Depends, Request, Query
+from ..schema.add_user import Register, MessageOut, Resend, ImportReport
+from ..crud.add_user import user_register, verify_user, resend_email_verification, bulk_import_users
 from ..database_setup import get_db
+from ..dep.admin import require_admin
+from ..utils.server_timing import TimedRoute
 
-router = APIRouter(prefix="/user", tags=["Add User"])
+router = APIRouter(prefix="/user", tags=["Add User"], route_class=TimedRoute)
 
 @router.post("/signup", status_code=status.HTTP_202_ACCEPTED, response_model=MessageOut)
-async def add_user(data:Register, backgroundtask:BackgroundTasks, session=Depends(get_db)):
+async def add_user(data:Register, session=Depends(get_db)):
     """
     step 1: user verification flow
     - add user route, create user, send verification email to user
     - Args: 
         - data: Register Input Schema, Body parameter
-        - background_tasks: default FastAPI background tasks for sending email
     - raises:
         - HTTPException 500 for internal server error and 409 conflict for duplicate email
     - Returns:
         - MessageOut output schema, 202 Accepted
-        - send verification email to client asynchronously
+        - verification email is written to the email outbox in the same transaction and sent asynchronously
     """
     try:
-        return await user_register(data, session, backgroundtask)
+        return await user_register(data, session)
     except HTTPException as Httpexc:
         raise Httpexc
     except Exception as e:
@@ -31,7 +32,7 @@ async def add_user(data:Register, backgroundtask:BackgroundTasks, session=Depend
     
 
 @router.get("/verify-email", status_code=status.HTTP_202_ACCEPTED, response_model=MessageOut)
-async def email_verification(token: str, backgroundtask:BackgroundTasks, session=Depends(get_db)):
+async def email_verification(token: str, session=Depends(get_db)):
     """
     step 2: user verification flow
     - Verification route by users, verification can only occur once.
@@ -45,7 +46,7 @@ async def email_verification(token: str, backgroundtask:BackgroundTasks, session
         - check inbox or spam folder for the email
     """
     try:
-        return await verify_user(token, backgroundtask, session)
+        return await verify_user(token, session)
     except HTTPException as Httpexc:
         raise Httpexc
     except Exception as e:
@@ -55,7 +56,7 @@ async def email_verification(token: str, backgroundtask:BackgroundTasks, session
         )
 
 @router.post("/resend-email", status_code=status.HTTP_202_ACCEPTED, response_model=MessageOut)
-async def resend_email(data:Resend, backgroundtask:BackgroundTasks, session=Depends(get_db)):
+async def resend_email(data:Resend, session=Depends(get_db)):
     """
     step 3: user verification flow(should in case user did not receive verification email, or token expired)
     - resend email verification endpoint, frontend integration or use postman
@@ -68,7 +69,29 @@ async def resend_email(data:Resend, backgroundtask:BackgroundTasks, session=Depe
         - send verification email to client
     """
     try:
-        return await resend_email_verification(data, session, backgroundtask)
+        return await resend_email_verification(data, session)
+    except HTTPException as Httpexc:
+        raise Httpexc
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=str(e)
+        )
+
+@router.post("/import", status_code=status.HTTP_200_OK, response_model=ImportReport, dependencies=[Depends(require_admin)])
+async def import_users(request: Request, format: str = Query("csv", pattern="^(csv|ndjson)$", description="csv with an email,name,stack header, or ndjson"), session=Depends(get_db)):
+    """
+    admin bulk user import
+    - Args:
+        - raw CSV or NDJSON request body, X-Admin-Token header
+    - raises:
+        - HTTPException 400 for a body that is not UTF-8 or not readable as CSV, 403 without a valid admin token, 500 for internal server error
+    - Returns:
+        - ImportReport with a created / duplicate / invalid result per row
+        - verification emails are queued in the email outbox in batches
+    """
+    try:
+        return await bulk_import_users(await request.body(), format, session)
     except HTTPException as Httpexc:
         raise Httpexc
     except Exception as e:
@@ -2,8 +2,9 @@ from fastapi import APIRouter, HTTPException, status, Depends
 from ..crud.cat_fact import get_me, get_user
 from ..database_setup import get_db
 from ..schema.cat_fact import MeOut
+from ..utils.server_timing import TimedRoute
 
-router = APIRouter(tags=["Cat Fact"])
+router = APIRouter(tags=["Cat Fact"], route_class=TimedRoute)
 
 @router.get("/me", status_code=status.HTTP_200_OK, response_model=MeOut)
 async def fetch_me(session=Depends(get_db)):
@@ -0,0 +1,27 @@
+# app/routers/docs.py
+from fastapi import APIRouter, Request
+from ..utils.openapi_cache import openapi_cache, OPENAPI_URL
+from ..utils.server_timing import TimedRoute
+
+router = APIRouter(include_in_schema=False, route_class=TimedRoute)
+
+@router.get(OPENAPI_URL)
+async def openapi_schema(request: Request):
+    """
+    OpenAPI document, serialised once and served precompressed with an ETag
+    """
+    return openapi_cache.get(request.app).schema.response(request)
+
+@router.get("/docs")
+async def swagger_ui(request: Request):
+    """
+    Swagger UI page
+    """
+    return openapi_cache.get(request.app).docs.response(request)
+
+@router.get("/redoc")
+async def redoc(request: Request):
+    """
+    ReDoc page
+    """
+    return openapi_cache.get(request.app).redoc.response(request)
@@ -0,0 +1,45 @@
+# app/routers/health.py
+import json
+from fastapi import APIRouter, Response
+from ..utils.startup import startup_state
+from ..utils.warmer import background_warmer, WARMER_ENABLED
+from ..utils.server_timing import TimedRoute
+
+router = APIRouter(tags=["Health"], route_class=TimedRoute)
+
+LIVE_BODY = b'{"status":"ok"}'
+
+
+def _json(body, status_code=200):
+    return Response(content=body, status_code=status_code, media_type="application/json", headers={"Cache-Control": "no-store"})
+
+
+@router.get("/healthz")
+@router.head("/healthz")
+async def healthz():
+    """
+    liveness, answered by the event loop alone
+    - Returns: 200 whenever the process can serve a request
+    """
+    return _json(LIVE_BODY)
+
+
+@router.get("/readyz")
+@router.head("/readyz")
+async def readyz():
+    """
+    readiness from the background warmer's last probe round, no I/O per call
+    - Returns:
+        - 200 when every READINESS_REQUIRED dependency passed its last probe
+        - 503 before the first round, when a required probe failed or when the probes went stale
+        - per dependency ok, latency_ms, last_checked, last_success and error
+    """
+    if not WARMER_ENABLED:
+        ready = startup_state["ready"]
+        return _json(json.dumps({"ready": ready, "probes": "disabled"}).encode(), 200 if ready else 503)
+    readiness = background_warmer.readiness
+    if readiness is None or not background_warmer.is_fresh():
+        reason = "no probe round yet" if readiness is None else "probes are stale"
+        return _json(json.dumps({"ready": False, "reason": reason, "dependencies": background_warmer.status}).encode(), 503)
+    ready, body = readiness
+    return _json(body, 200 if ready else 503)
@@ -1,17 +1,48 @@
 # app/routes/keepalive.py
 from fastapi import APIRouter, Header, HTTPException, status, Depends
-from sqlalchemy import text
 from ..database_setup import get_db
 from ..sec import KEEP_ALIVE_TOKEN
+from ..crud.email_outbox import outbox_metrics
+from ..utils.email_outbox import outbox_relay
+from ..middleware import admission_controller
+from ..utils.startup import startup_state
+from ..utils.warmer import background_warmer
+from ..utils.server_timing import TimedRoute
 
-router = APIRouter(tags=["Keep Alive"])
+router = APIRouter(tags=["Keep Alive"], route_class=TimedRoute)
 
 @router.get("/internal/keepalive")
-async def keepalive(session=Depends(get_db)):
-    await session.execute(text("SELECT 1"))
-    return {"ok": True}
+async def keepalive():
+    """
+    dependency status as last seen by the background warmer, no I/O per ping
+    - Returns: overall ok plus per dependency latency, last check and last success
+    """
+    status_by_name = background_warmer.status
+    return {"ok": all(entry["ok"] for entry in status_by_name.values()), "dependencies": status_by_name}
 
-# Cron-job.org keep-alive
+# Cron-job.org keep-alive, only keeps the instance awake; connections are kept warm by the background warmer
 @router.get("/cron")
 async def cron_job():
-    return {"status": "cron triggered"}
\ No newline at end of file
+    return {"status": "cron triggered", "warmer_rounds": background_warmer.stats["rounds"]}
+
+@router.get("/internal/email-outbox")
+async def email_outbox_status(session=Depends(get_db)):
+    """
+    email outbox lag and throughput
+    - table figures cover every relay process, relay figures cover this process only
+    """
+    return {**await outbox_metrics(session), "relay": outbox_relay.stats}
+
+@router.get("/internal/admission")
+async def admission_status():
+    """
+    admission control pools, in use units, queue depth and shed counts for this process
+    """
+    return admission_controller.snapshot()
+
+@router.get("/internal/startup")
+async def startup_status():
+    """
+    startup report for this process, warmup step timings and, with IMPORT_TIME_REPORT, the slowest imports
+    """
+    return startup_state
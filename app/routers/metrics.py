@@ -0,0 +1,17 @@
+# app/routers/metrics.py
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from ..utils.metrics import metrics_exporter
+from ..utils.server_timing import TimedRoute
+
+router = APIRouter(tags=["Metrics"], route_class=TimedRoute)
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """
+    Prometheus scrape endpoint
+    - request latency histograms per route template, db, upstream and email metrics
+    - Returns: text exposition format 0.0.4
+    """
+    body = await metrics_exporter.collect()
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,34 @@
+# app/routers/profiling.py
+import asyncio
+from fastapi import APIRouter, HTTPException, status, Depends
+from fastapi.responses import Response
+from ..dep.admin import require_admin
+from ..utils.profiling import list_profiles, load_profile
+from ..utils.server_timing import TimedRoute
+
+router = APIRouter(prefix="/internal/profiles", tags=["Profiling"], dependencies=[Depends(require_admin)], route_class=TimedRoute)
+
+@router.get("")
+async def profiles():
+    """
+    stored request profiles, newest first
+    - requires the X-Admin-Token header
+    """
+    return await asyncio.to_thread(list_profiles)
+
+@router.get("/{profile_id}")
+async def profile(profile_id: str):
+    """
+    one stored profile, pyinstrument HTML or cProfile text
+    - requires the X-Admin-Token header
+    - Error Response:
+        - 404 Not Found: unknown profile id
+    """
+    found = await asyncio.to_thread(load_profile, profile_id)
+    if found is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="profile does not exist"
+        )
+    content, media_type = found
+    return Response(content, media_type=media_type)
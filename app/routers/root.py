@@ -1,6 +1,7 @@
 from fastapi import APIRouter, Response
+from ..utils.server_timing import TimedRoute
 
-router = APIRouter(tags=["Root"])
+router = APIRouter(tags=["Root"], route_class=TimedRoute)
 
 # Render liveness check
 @router.get("/")
@@ -1,14 +1,29 @@
-from fastapi import APIRouter, HTTPException, status, Depends, Query
-from ..crud.string_analysis import create_single_string, get_current_string, all_single_string, delete_single_string, all_string_fil, natural_language_filtering
+from fastapi import APIRouter, HTTPException, status, Depends, Query, Request, Response
+from ..crud.string_analysis import create_single_string, get_current_string, all_single_string, delete_single_string, all_string_fil, natural_language_filtering, get_string_stats, bulk_delete_strings, string_mirror_report, strings_generation, ensure_string_exists
 from ..database_setup import get_db
-from ..schema.string_analysis import StringAnaly, StringBody, StringFil, StringNat
-from typing import Optional
+from ..dep.admin import require_admin
+from ..schema.string_analysis import StringAnaly, StringBody, StringFil, StringNat, StringStatsOut, StringBulkDelete
+from typing import Optional, List
 from fastapi_pagination import Page
-from ..utils.string_analysis import StringParams
+from ..utils.string_analysis import StringParams, string_projection, BULK_DELETE_CHUNK, BULK_DELETE_MAX_CHUNKS, string_etag, list_etag
+from ..utils.compression import not_modified
+from ..utils.string_mirror import string_mirror
+from ..utils.server_timing import TimedRoute
+from ..utils.db_instrumentation import query_budget
 
-router = APIRouter(tags=["String Analysis"])
+router = APIRouter(tags=["String Analysis"], route_class=TimedRoute)
+
+#clients may keep responses but revalidate them with If-None-Match every time
+CACHE_CONTROL = "no-cache"
+
+
+async def _list_etag(request, session):
+    # read before the listing query, so a write landing in between only ever makes the tag older than the body
+    generation = await strings_generation(session)
+    return list_etag(generation, request.url.path, request.url.query)
 
 @router.post("/strings", status_code=status.HTTP_201_CREATED, response_model=StringAnaly)
+@query_budget(3)
 async def create_string(value:StringBody, session=Depends(get_db)):
     """
     API to Create and Analyze String
@@ -35,6 +50,7 @@ async def create_string(value:StringBody, session=Depends(get_db)):
 @router.get("/strings/filter-by-natural-language", response_model=StringNat, status_code=status.HTTP_200_OK)
 async def natural_language_filtering_endpoint(
     query: Optional[str] = Query(None, description="user text to string"),
+    projection = Depends(string_projection),
     session = Depends(get_db)):
     """
     Endpoint to filter by user text
@@ -42,7 +58,45 @@ async def natural_language_filtering_endpoint(
         - takes 1 query paramter as string
     """
     try:
-        return await natural_language_filtering(query, session)
+        return await natural_language_filtering(query, session, projection)
+    except HTTPException as httpexc:
+        raise httpexc
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=str(e)
+        )
+
+@router.get("/strings/stats", response_model=StringStatsOut, status_code=status.HTTP_200_OK)
+@query_budget(1)
+async def string_stats_endpoint(session = Depends(get_db)):
+    """
+    Endpoint for aggregate string statistics
+    - served from incrementally maintained counters, no scan of the string table
+    - Returns:
+        - total, palindrome ratio, average length, length histogram and word count distribution
+    """
+    try:
+        return await get_string_stats(session)
+    except HTTPException as httpexc:
+        raise httpexc
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=str(e)
+        )
+
+@router.get("/strings/mirror/report", status_code=status.HTTP_200_OK, dependencies=[Depends(require_admin)])
+async def string_mirror_report_endpoint(
+    check: bool = Query(False, description="Also compare the mirrored ids with the database"),
+    session = Depends(get_db)):
+    """
+    Endpoint reporting the in-memory string mirror, requires the X-Admin-Token header
+    - Returns:
+        - row count and memory usage per column, plus a consistency check against the database when check=true
+    """
+    try:
+        return await string_mirror_report(check, session)
     except HTTPException as httpexc:
         raise httpexc
     except Exception as e:
@@ -52,7 +106,8 @@ async def natural_language_filtering_endpoint(
         )
     
 @router.get("/strings/{string_value}", status_code=status.HTTP_200_OK, response_model=StringAnaly)
-async def single_current_string(string_value:str, session=Depends(get_db)):
+@query_budget(1)
+async def single_current_string(string_value:str, request: Request, response: Response, projection = Depends(string_projection), session=Depends(get_db)):
     """
     API to Create and Analyze String
     - Agrs:
@@ -66,7 +121,16 @@ async def single_current_string(string_value:str, session=Depends(get_db)):
 
     """
     try:
-        return await get_current_string(string_value, session)
+        etag = string_etag(string_value, projection)
+        cached = not_modified(request, etag, CACHE_CONTROL)
+        if cached is not None:
+            # the row never changes, it only has to still exist
+            await ensure_string_exists(string_value, session)
+            return cached
+        result = await get_current_string(string_value, session, projection)
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = CACHE_CONTROL
+        return result
     except HTTPException as httpexc:
         raise httpexc
     except Exception as e:
@@ -76,7 +140,8 @@ async def single_current_string(string_value:str, session=Depends(get_db)):
         )
 
 @router.get("/strings/search/all", response_model=Page[StringAnaly], status_code = status.HTTP_200_OK)
-async def all_strings(params: StringParams = Depends(), session = Depends(get_db)):
+@query_budget(3)
+async def all_strings(request: Request, response: Response, params: StringParams = Depends(), projection = Depends(string_projection), session = Depends(get_db)):
     """
     API to Create and Analyze String
     - Agrs:
@@ -90,7 +155,14 @@ async def all_strings(params: StringParams = Depends(), session = Depends(get_db
 
     """
     try:
-        return await all_single_string(params, session)
+        etag = await _list_etag(request, session)
+        cached = not_modified(request, etag, CACHE_CONTROL)
+        if cached is not None:
+            return cached
+        result = await all_single_string(params, session, projection)
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = CACHE_CONTROL
+        return result
     except HTTPException as httpexc:
         raise httpexc
     except Exception as e:
@@ -100,6 +172,7 @@ async def all_strings(params: StringParams = Depends(), session = Depends(get_db
         )
         
 @router.delete("/strings/{string_value}", status_code=status.HTTP_204_NO_CONTENT)
+@query_budget(3)
 async def single_string_delete_endpoint(string_value:str, session=Depends(get_db)):
     """
     API to Create and Analyze String
@@ -125,19 +198,38 @@ async def single_string_delete_endpoint(string_value:str, session=Depends(get_db
     
 @router.get("/strings", response_model=StringFil, status_code=status.HTTP_200_OK)
 async def all_strings_fil_endpoint(
+    request: Request,
+    response: Response,
     is_palindrome: Optional[bool] = Query(None, description="Filter by palindrome status"),
     min_length: Optional[int] = Query(None, description="Minimum string length"), 
     max_length: Optional[int] = Query(None, description="Maximum string length"),
     word_count: Optional[int] = Query(None, description="Exact word count"),
     contains_character: Optional[str] = Query(None, description="Character or substring to search for"),
+    contains_all: Optional[List[str]] = Query(None, description="Characters that must all be present, repeat the parameter per character"),
+    contains_any: Optional[List[str]] = Query(None, description="Characters of which at least one must be present, repeat the parameter per character"),
+    projection = Depends(string_projection),
     session = Depends(get_db)):
     """
     Endpoint to get all strings with filtering
     - Args:
-        - takes 5 query parameters
+        - takes 7 query parameters
+    - Returns:
+        - 304 Not Modified when If-None-Match still matches, before the filter query runs;
+          no ETag when the string mirror answers
     """
     try:
-        return await all_string_fil(is_palindrome, min_length, max_length, word_count, contains_character, session)
+        if string_mirror.ready:
+            # the body comes from this worker's mirror, which can lag other workers' writes
+            # until its next reload; a tag from the database generation would outlive that lag
+            return await all_string_fil(is_palindrome, min_length, max_length, word_count, contains_character, session, contains_all, contains_any, projection)
+        etag = await _list_etag(request, session)
+        cached = not_modified(request, etag, CACHE_CONTROL)
+        if cached is not None:
+            return cached
+        result = await all_string_fil(is_palindrome, min_length, max_length, word_count, contains_character, session, contains_all, contains_any, projection)
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = CACHE_CONTROL
+        return result
     except HTTPException as httpexc:
         raise httpexc
     except Exception as e:
@@ -146,3 +238,37 @@ async def all_strings_fil_endpoint(
             detail=str(e)
         )
 
+
+
+@router.delete("/strings", response_model=StringBulkDelete, status_code=status.HTTP_200_OK, dependencies=[Depends(require_admin)])
+#a DELETE ... RETURNING and a stats upsert per chunk, plus the empty DELETE that ends the loop
+@query_budget(2 * BULK_DELETE_MAX_CHUNKS + 1)
+async def bulk_delete_strings_endpoint(
+    is_palindrome: Optional[bool] = Query(None, description="Filter by palindrome status"),
+    min_length: Optional[int] = Query(None, description="Minimum string length"), 
+    max_length: Optional[int] = Query(None, description="Maximum string length"),
+    word_count: Optional[int] = Query(None, description="Exact word count"),
+    contains_character: Optional[str] = Query(None, description="Character or substring to search for"),
+    contains_all: Optional[List[str]] = Query(None, description="Characters that must all be present, repeat the parameter per character"),
+    contains_any: Optional[List[str]] = Query(None, description="Characters of which at least one must be present, repeat the parameter per character"),
+    dry_run: bool = Query(False, description="Only report how many strings match"),
+    chunk_size: int = Query(BULK_DELETE_CHUNK, ge=1, le=5000, description="Rows deleted per transaction"),
+    session = Depends(get_db)):
+    """
+    Endpoint to delete every string matching the filters, requires the X-Admin-Token header
+    - Args:
+        - takes the same filter query parameters as GET /strings, at least one is required
+        - dry_run: report the affected count without deleting
+    - Returns:
+        - count of deleted (or matching, for dry_run) strings
+        - complete=false when BULK_DELETE_MAX_CHUNKS chunks were deleted and more may match, repeat the request
+    """
+    try:
+        return await bulk_delete_strings(is_palindrome, min_length, max_length, word_count, contains_character, session, contains_all, contains_any, dry_run, chunk_size)
+    except HTTPException as httpexc:
+        raise httpexc
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=str(e)
+        )
\ No newline at end of file
@@ -1,6 +1,6 @@
 from .general import StrictBaseModel as BaseModel
 from pydantic import EmailStr, Field, field_validator
-from typing import Annotated
+from typing import Annotated, List, Optional
 import re
 
 class Register(BaseModel):
@@ -67,4 +67,17 @@ class Resend(BaseModel):
     @field_validator("email")
     def normalize_email(cls, v: str) -> str:
         return v.strip().lower()
-    
\ No newline at end of file
+    
+
+class ImportRowResult(BaseModel):
+    row: int
+    email: Optional[str] = None
+    status: str
+    detail: Optional[str] = None
+
+class ImportReport(BaseModel):
+    total: int
+    created: int
+    duplicates: int
+    invalid: int
+    results: List[ImportRowResult]
\ No newline at end of file
@@ -36,6 +36,8 @@ class StringQuery(BaseModel):
     max_length: Optional[int] = None
     word_count: Optional[int] = None
     contains_character: Optional[str] = None
+    contains_all: Optional[List[str]] = None
+    contains_any: Optional[List[str]] = None
 
 class StringFil(BaseModel):
     data: List[StringAnaly] = Field(default_factory=list)
@@ -49,4 +51,20 @@ class StringInter(BaseModel):
 class StringNat(BaseModel):
     data: List[StringAnaly] = Field(default_factory=list)
     count: int
-    interpreted_query: StringInter
\ No newline at end of file
+    interpreted_query: StringInter
+
+class StringStatsOut(BaseModel):
+    total: int
+    palindrome_count: int
+    palindrome_ratio: float
+    average_length: float
+    length_histogram: Dict[str, int]
+    word_count_distribution: Dict[str, int]
+
+class StringBulkDelete(BaseModel):
+    count: int
+    dry_run: bool
+    chunks: int
+    #false when the request stopped at BULK_DELETE_MAX_CHUNKS and matching strings may remain
+    complete: bool = True
+    filters_applied: Dict[str, Any]
\ No newline at end of file
@@ -4,3 +4,7 @@ DATABASE_URL = config('DATABASE_URL')
 SECRET_KEY = config('SECRET_KEY')
 ALGORITHM = config('ALGORITHM')
 KEEP_ALIVE_TOKEN = config("KEEP_ALIVE_TOKEN")
+#optional in-process columnar mirror of the string table
+STRING_MIRROR_ENABLED = config("STRING_MIRROR_ENABLED", default=False, cast=bool)
+#shared secret for admin endpoints, sent as the X-Admin-Token header; admin endpoints are disabled when empty
+ADMIN_TOKEN = config("ADMIN_TOKEN", default="")
@@ -1,9 +1,9 @@
 from fastapi.middleware.cors import CORSMiddleware
 import logging
-import sys
 from fastapi import FastAPI, Request, status
 from fastapi.exceptions import RequestValidationError
 from fastapi.responses import JSONResponse
+from .utils.logging_setup import configure_logging
 
 
 def configure_cors(app):
@@ -16,12 +16,8 @@ def configure_cors(app):
         allow_headers=["*"],
     )
 
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
-    handlers=[logging.StreamHandler(sys.stdout)],
-    force=True
-)
+#records go through a queue to a background writer thread, see app/utils/logging_setup.py
+configure_logging()
 
 logger = logging.getLogger(__name__)
 
@@ -1,12 +1,26 @@
 from ..sec import SECRET_KEY, ALGORITHM
+import csv
+import io
+import json
+import time
+import uuid
 import jwt
-from datetime import datetime, timedelta
-from sendgrid import SendGridAPIClient
-from sendgrid.helpers.mail import Mail, Email, To, Content
+from collections import OrderedDict
+from functools import lru_cache
+from typing import List
+from pydantic import TypeAdapter, ValidationError
+from ..schema.add_user import Register
+from .server_timing import timed
 from decouple import config
+from datetime import datetime, timedelta
 from fastapi import HTTPException, status
+from .email_dispatch import EmailMessage
+
+@lru_cache(maxsize=1)
+def signing_key():
+    """SECRET_KEY parsed once for ALGORITHM instead of on every encode and decode"""
+    return jwt.get_algorithm_by_name(ALGORITHM).prepare_key(SECRET_KEY)
 
-sg = SendGridAPIClient(config('SENDGRID_API_KEY'))
 
 async def encode_email_token(payload, expires_delta: int = 4320):
     """
@@ -22,24 +36,28 @@ async def encode_email_token(payload, expires_delta: int = 4320):
     now = datetime.utcnow()
     expire = now + timedelta(minutes=expires_delta)
 
-    # Add issued-at and expiry
+    # Add issued-at, expiry and a unique id used to reject replays
     to_encode.update({
         "iat": now,
-        "exp": expire
+        "exp": expire,
+        "jti": uuid.uuid4().hex
     })
 
     # return encoded JWT token
-    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    return jwt.encode(to_encode, signing_key(), algorithm=ALGORITHM)
 
 
-async def send_verification_email(email, token, username):
+@timed("email")
+def build_verification_email(email, token, username):
     """
-    Send verification email to user
+    Build the verification email for a user
     
     Args:
         email: Recipient email address
         token: Verification token
         username: User's name for personalization
+    Returns:
+        EmailMessage: to be queued in the email outbox
     """
     # placeholder for development testing
     backend_url = "https://acsp-cat-fact.pxxl.click"
@@ -81,24 +99,15 @@ async def send_verification_email(email, token, username):
         </body>
     </html>
     """
-    try:
-        print(f"Attempting to send verification email")
-        
-        message = Mail(
-            from_email=Email(config('MAIL_FROM_EMAIL'), config('MAIL_FROM_NAME')),
-            to_emails=To(email),
-            subject='Verify Your Email - CAT FACT',
-            html_content=Content("text/html", html_body)
-        )
-        
-        response = sg.send(message)
-        print("email successfully sent")    
-    except Exception as e:
-        print(f"Failed to send verification email: {str(e)}")
+    return EmailMessage(
+        to=email,
+        subject='Verify Your Email - CAT FACT',
+        html=html_body
+    )
 
 async def decode_token(token):
     try:
-        return jwt.decode(token, SECRET_KEY, ALGORITHM)
+        return jwt.decode(token, signing_key(), algorithms=[ALGORITHM])
     except jwt.ExpiredSignatureError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -110,13 +119,55 @@ async def decode_token(token):
             detail="Invalid token. Please log in again.",
         )
     
-async def send_welcome_email(email, username, user_id):
+class ConsumedTokenFilter:
+    """
+    Bounded, time windowed set of consumed token ids (jti)
+    - an entry lives until its token expires or it is evicted to stay within capacity
+    - a miss is not proof the token is unused, callers fall back to the database
+    """
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._entries = OrderedDict()
+
+    def __contains__(self, jti) -> bool:
+        exp = self._entries.get(jti)
+        if exp is None:
+            return False
+        if exp < time.time():
+            del self._entries[jti]
+            return False
+        return True
+
+    def add(self, jti, exp):
+        if not jti:
+            return
+        self._entries[jti] = exp or time.time()
+        self._entries.move_to_end(jti)
+        # tokens share one lifetime, so insertion order is close to expiry order
+        now = time.time()
+        while self._entries and next(iter(self._entries.values())) < now:
+            self._entries.popitem(last=False)
+        while len(self._entries) > self.capacity:
+            self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+#per process replay filter for email verification links
+consumed_tokens = ConsumedTokenFilter(capacity=config("CONSUMED_TOKEN_CAPACITY", default=50000, cast=int))
+
+
+@timed("email")
+def build_welcome_email(email, username, user_id):
     """
-    Send welcome email after successful verification
+    Build the welcome email sent after successful verification
     
     Args:
         email: User's email
         username: User's name
+    Returns:
+        EmailMessage: to be queued in the email outbox
     """
     backend_url = "https://acsp-cat-fact.pxxl.click"
     app_link = f"{backend_url}/user?q={user_id}"
@@ -169,17 +220,72 @@ async def send_welcome_email(email, username, user_id):
         </body>
     </html>
     """
+    return EmailMessage(
+        to=email,
+        subject='WELCOME TO CAT FACT',
+        html=html_body
+    )
+
+
+IMPORT_FIELDS = ("email", "name", "stack")
+_register_rows = TypeAdapter(List[Register])
+
+def parse_import_rows(raw: bytes, fmt: str):
+    """
+    Parse a CSV (with a header row) or NDJSON user import
+    Args:
+        raw: file content
+        fmt: "csv" or "ndjson"
+    Returns:
+        list of (row number, dict of fields or None, parse error or None)
+    raises:
+        HTTPException 400 when the file is not UTF-8 or not readable as CSV
+    """
     try:
-        print(f"Attempting to send verification email")
-        
-        message = Mail(
-            from_email=Email(config('MAIL_FROM_EMAIL'), config('MAIL_FROM_NAME')),
-            to_emails=To(email),
-            subject='WELCOME TO CAT FACT',
-            html_content=Content("text/html", html_body)
+        text = raw.decode("utf-8-sig")
+    except UnicodeDecodeError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Import file must be UTF-8 encoded: invalid byte at position {e.start}"
         )
-        
-        response = sg.send(message)
-        print("email successfully sent")    
-    except Exception as e:
-        print(f"Failed to send verification email: {str(e)}")
\ No newline at end of file
+    rows = []
+    if fmt == "csv":
+        try:
+            for number, record in enumerate(csv.DictReader(io.StringIO(text)), start=1):
+                rows.append((number, {k: record[k] for k in IMPORT_FIELDS if record.get(k) is not None}, None))
+        except csv.Error as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Malformed CSV: {e}"
+            )
+        return rows
+    for number, line in enumerate((l for l in text.splitlines() if l.strip()), start=1):
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            rows.append((number, None, f"invalid JSON: {e.msg}"))
+            continue
+        if not isinstance(record, dict):
+            rows.append((number, None, "expected a JSON object"))
+            continue
+        rows.append((number, {k: record[k] for k in IMPORT_FIELDS if k in record}, None))
+    return rows
+
+
+def validate_import_rows(records):
+    """
+    Validate every record with the Register rules in one pass over the whole list
+    Returns:
+        (list of (index, Register) for valid records, dict of index -> error message)
+    """
+    try:
+        return list(enumerate(_register_rows.validate_python(records))), {}
+    except ValidationError as exc:
+        errors = {}
+        for err in exc.errors():
+            index = err["loc"][0]
+            field = ".".join(str(part) for part in err["loc"][1:])
+            errors.setdefault(index, []).append(f"{field}: {err['msg']}" if field else err["msg"])
+    valid_index = [i for i in range(len(records)) if i not in errors]
+    valid = _register_rows.validate_python([records[i] for i in valid_index])
+    return list(zip(valid_index, valid)), {i: "; ".join(msgs) for i, msgs in errors.items()}
\ No newline at end of file
@@ -1,50 +1,93 @@
-import requests
-from requests.exceptions import RequestException, Timeout, ConnectionError
+import asyncio
+import time
+from decouple import config
+from .metrics import UPSTREAM_REQUESTS, UPSTREAM_DURATION
+from . import server_timing
 
-CAT_FACT_API_URL = f"https://catfact.ninja/fact"
-API_TIMEOUT = 10 
+#overridable so load tests can point at a local stand-in
+CAT_FACT_API_URL = config("CAT_FACT_API_URL", default="https://catfact.ninja/fact")
+API_TIMEOUT = 10
+#keep-alive connections kept to the upstream, one per concurrent fetch
+CAT_FACT_POOL_SIZE = config("CAT_FACT_POOL_SIZE", default=20, cast=int)
 FALLBACK_FACT = "Cats are amazing creatures! (Fun fact temporarily unavailable)"
 
-async def fetch_cat_fact():
+_session = None
+
+
+def http_session():
     """
-    Fetch a cat fact from external API with proper error handling.
-    
-    Returns:
-        str: Cat fact or fallback message
+    Shared requests session, built on first use so importing the app does not
+    pay for requests; its pool keeps the TLS connection to the upstream open
     """
+    global _session
+    if _session is None:
+        import requests
+        from requests.adapters import HTTPAdapter
+        session = requests.Session()
+        session.headers["Accept"] = "application/json"
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=CAT_FACT_POOL_SIZE)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        _session = session
+    return _session
+
+
+def _fetch_cat_fact_sync():
+    """Blocking fetch, returns (fact, outcome); runs in a worker thread"""
+    import requests
+    from requests.exceptions import RequestException, Timeout, ConnectionError
     try:
-        response = requests.get(
-            CAT_FACT_API_URL,
-            timeout=API_TIMEOUT,
-            headers={'Accept': 'application/json'}
-        )
-        
+        response = http_session().get(CAT_FACT_API_URL, timeout=API_TIMEOUT)
+
         # Check if request was successful
         response.raise_for_status()
-        
+
         # Parse JSON response
         data = response.json()
-        
+
         # Validate response structure
         if "fact" not in data:
-            return FALLBACK_FACT
-        
-        return data["fact"]
-    
+            return FALLBACK_FACT, "invalid_response"
+
+        return data["fact"], "ok"
+
     except Timeout:
-        return FALLBACK_FACT
-    
+        return FALLBACK_FACT, "timeout"
+
     except ConnectionError:
-        return FALLBACK_FACT
-    
+        return FALLBACK_FACT, "connection_error"
+
     except requests.exceptions.HTTPError as e:
-        return FALLBACK_FACT
-    
+        return FALLBACK_FACT, "http_error"
+
     except requests.exceptions.JSONDecodeError:
-        return FALLBACK_FACT
-    
+        return FALLBACK_FACT, "invalid_response"
+
     except RequestException as e:
-        return FALLBACK_FACT
-    
+        return FALLBACK_FACT, "error"
+
     except Exception as e:
-        return FALLBACK_FACT
\ No newline at end of file
+        return FALLBACK_FACT, "error"
+
+
+async def fetch_cat_fact():
+    """
+    Fetch a cat fact from external API with proper error handling.
+    The blocking request runs in a thread so the event loop keeps serving.
+
+    Returns:
+        str: Cat fact or fallback message
+    """
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        fact, outcome = await asyncio.to_thread(_fetch_cat_fact_sync)
+        return fact
+    except Exception as e:
+        return FALLBACK_FACT
+    finally:
+        duration = time.perf_counter() - start
+        labels = ("catfact", outcome)
+        UPSTREAM_REQUESTS.inc(labels)
+        UPSTREAM_DURATION.observe(duration, labels)
+        server_timing.record("upstream", duration)
@@ -0,0 +1,199 @@
+# app/utils/compression.py
+"""
+Content negotiation, response compression and conditional GET helpers.
+
+brotli is optional (pip install brotli); without it only gzip is offered.
+"""
+import gzip
+import hashlib
+import zlib
+from decouple import config
+from fastapi import Request, Response
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+#best first, only what this process can produce
+SUPPORTED_ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+
+COMPRESSION_ENABLED = config("COMPRESSION_ENABLED", default=True, cast=bool)
+#smaller bodies fit in a packet or two, compressing them costs more than it saves
+COMPRESSION_MIN_SIZE = config("COMPRESSION_MIN_SIZE", default=1024, cast=int)
+#per request levels, favour speed; precompressed bodies always use the maximum
+COMPRESSION_GZIP_LEVEL = config("COMPRESSION_GZIP_LEVEL", default=6, cast=int)
+COMPRESSION_BROTLI_QUALITY = config("COMPRESSION_BROTLI_QUALITY", default=4, cast=int)
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/problem+json", "application/javascript", "image/svg+xml")
+
+
+def parse_accept_encoding(header):
+    """Accept-Encoding as {coding: q}"""
+    accepted = {}
+    for part in (header or "").split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[coding] = q
+    return accepted
+
+
+def choose_encoding(header, available=SUPPORTED_ENCODINGS):
+    """Preferred coding the client accepts, None for identity"""
+    accepted = parse_accept_encoding(header)
+    wildcard = accepted.get("*", 0.0)
+    best, best_q = None, 0.0
+    for coding in available:
+        q = accepted.get(coding, wildcard)
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def compress(body, encoding, level=None):
+    if encoding == "br":
+        return brotli.compress(body, quality=11 if level is None else level)
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=9 if level is None else level, mtime=0)
+    return body
+
+
+def etag_for(body):
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def variant_etag(etag, encoding):
+    # each encoding is its own representation, so it gets its own validator
+    return etag if encoding is None else etag[:-1] + "-" + encoding + '"'
+
+
+def _base_etag(tag):
+    for encoding in SUPPORTED_ENCODINGS:
+        suffix = "-" + encoding + '"'
+        if tag.endswith(suffix):
+            return tag[:-len(suffix)] + '"'
+    return tag
+
+
+def etag_matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return etag in candidates
+
+
+def not_modified(request: Request, etag, cache_control="no-cache"):
+    """
+    304 response when If-None-Match holds etag, in any of the encoded variants
+    CompressionMiddleware derives from it, else None; the 304 echoes the tag the client sent
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return None
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*" or _base_etag(tag.removeprefix("W/")) == etag:
+            return Response(status_code=304, headers={"ETag": etag if tag == "*" else tag, "Cache-Control": cache_control, "Vary": "Accept-Encoding"})
+    return None
+
+
+class PrecompressedBody:
+    """A response body compressed once at maximum level for every supported coding"""
+    def __init__(self, body, media_type, cache_control="public, no-cache"):
+        self.media_type = media_type
+        self.cache_control = cache_control
+        self.etag = etag_for(body)
+        self.variants = {None: body}
+        for encoding in SUPPORTED_ENCODINGS:
+            self.variants[encoding] = compress(body, encoding)
+
+    def response(self, request: Request) -> Response:
+        encoding = choose_encoding(request.headers.get("accept-encoding"))
+        etag = variant_etag(self.etag, encoding)
+        headers = {"ETag": etag, "Cache-Control": self.cache_control, "Vary": "Accept-Encoding"}
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+        if encoding is not None:
+            headers["Content-Encoding"] = encoding
+        return Response(self.variants[encoding], media_type=self.media_type, headers=headers)
+
+
+def _compressor(encoding):
+    if encoding == "br":
+        compressor = brotli.Compressor(quality=COMPRESSION_BROTLI_QUALITY)
+        return compressor.process, compressor.finish
+    compressor = zlib.compressobj(COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress, compressor.flush
+
+
+class CompressionMiddleware:
+    """
+    Pure ASGI gzip / brotli compression of text and JSON responses at or above
+    minimum_size; streamed bodies are compressed chunk by chunk. Responses that
+    already carry a Content-Encoding (the precompressed docs) pass untouched
+    """
+    def __init__(self, app, minimum_size=COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding"))
+        start_message = None
+        compress_chunk = finish = None
+
+        async def send_wrapper(message):
+            nonlocal start_message, compress_chunk, finish
+            if message["type"] == "http.response.start":
+                # held back until the first body chunk shows whether it is worth compressing
+                start_message = message
+                return
+            if message["type"] == "http.response.body" and compress_chunk is not None:
+                body = compress_chunk(message.get("body", b""))
+                more_body = message.get("more_body", False)
+                if not more_body:
+                    body += finish()
+                return await send({"type": "http.response.body", "body": body, "more_body": more_body})
+            if message["type"] != "http.response.body" or start_message is None:
+                return await send(message)
+
+            start, start_message = start_message, None
+            headers = MutableHeaders(raw=start["headers"])
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            content_type = headers.get("content-type", "")
+            compressible = content_type.startswith(COMPRESSIBLE_TYPES) and "content-encoding" not in headers
+            if compressible:
+                headers.add_vary_header("Accept-Encoding")
+            if not compressible or encoding is None or start["status"] in (204, 304) or (not more_body and len(body) < self.minimum_size):
+                await send(start)
+                return await send(message)
+
+            headers["Content-Encoding"] = encoding
+            etag = headers.get("etag")
+            if etag:
+                headers["ETag"] = variant_etag(etag, encoding)
+            if more_body:
+                compress_chunk, finish = _compressor(encoding)
+                del headers["Content-Length"]
+                body = compress_chunk(body)
+            else:
+                body = compress(body, encoding, COMPRESSION_BROTLI_QUALITY if encoding == "br" else COMPRESSION_GZIP_LEVEL)
+                headers["Content-Length"] = str(len(body))
+            await send(start)
+            await send({"type": "http.response.body", "body": body, "more_body": more_body})
+
+        await self.app(scope, receive, send_wrapper)
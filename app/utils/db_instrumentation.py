@@ -0,0 +1,123 @@
+# app/utils/db_instrumentation.py
+"""
+SQLAlchemy engine event hooks recording every statement's duration for
+/metrics and the Server-Timing header, logging slow statements with their
+route, and counting statements per request against a declared budget.
+"""
+import contextvars
+import logging
+import re
+import time
+from functools import lru_cache
+from decouple import config
+from sqlalchemy import event
+from .metrics import DB_QUERIES, DB_QUERY_DURATION
+from . import server_timing
+
+#statements at or above this many milliseconds are logged with their route, 0 disables
+SLOW_QUERY_MS = config("SLOW_QUERY_MS", default=200.0, cast=float)
+#raise instead of warn when a route goes over its query budget, meant for tests and CI
+QUERY_BUDGET_STRICT = config("QUERY_BUDGET_STRICT", default=False, cast=bool)
+
+logger = logging.getLogger(__name__)
+
+_LITERALS = (
+    (re.compile(r"'(?:[^']|'')*'"), "?"),
+    (re.compile(r"\$\d+|%\([^)]+\)s|\b\d+(?:\.\d+)?\b"), "?"),
+    (re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)"), "(?, ...)"),
+    (re.compile(r"\s+"), " "),
+)
+
+
+class QueryBudgetExceeded(RuntimeError):
+    pass
+
+
+class RequestQueries:
+    """Statements issued while serving one request"""
+    __slots__ = ("scope", "count")
+
+    def __init__(self, scope):
+        self.scope = scope
+        self.count = 0
+
+    @property
+    def route(self):
+        route = self.scope.get("route")
+        return getattr(route, "path", None) or self.scope["path"]
+
+    @property
+    def budget(self):
+        return getattr(getattr(self.scope.get("route"), "endpoint", None), "query_budget", None)
+
+
+#set by QueryBudgetMiddleware, None outside a request
+_request_queries = contextvars.ContextVar("request_queries", default=None)
+
+
+def begin_request(scope):
+    """Start counting for a request, returns the state and the token for end_request"""
+    state = RequestQueries(scope)
+    return state, _request_queries.set(state)
+
+
+def end_request(token):
+    _request_queries.reset(token)
+
+
+def query_budget(limit):
+    """Declare the most statements an endpoint may issue, apply below the router decorator"""
+    def decorator(endpoint):
+        endpoint.query_budget = limit
+        return endpoint
+    return decorator
+
+
+@lru_cache(maxsize=1024)
+def normalise_sql(statement: str) -> str:
+    """Statement text with literals and bind parameters replaced, so variants group together"""
+    for pattern, replacement in _LITERALS:
+        statement = pattern.sub(replacement, statement)
+    return statement.strip()
+
+
+def _operation(statement: str) -> str:
+    head = statement.lstrip().split(None, 1)
+    return head[0].upper() if head else "UNKNOWN"
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._query_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    duration = time.perf_counter() - context._query_start
+    labels = (_operation(statement),)
+    DB_QUERIES.inc(labels)
+    DB_QUERY_DURATION.observe(duration, labels)
+    server_timing.record("db", duration)
+
+    state = _request_queries.get()
+    if SLOW_QUERY_MS and duration * 1000 >= SLOW_QUERY_MS:
+        route = state.route if state is not None else "-"
+        sql = normalise_sql(statement)
+        logger.warning(
+            "slow query %.1fms on %s: %s", duration * 1000, route, sql,
+            extra={"sql": sql, "duration_ms": round(duration * 1000, 3), "route": route}
+        )
+    if state is None:
+        return
+    state.count += 1
+    if QUERY_BUDGET_STRICT:
+        budget = state.budget
+        if budget is not None and state.count > budget:
+            raise QueryBudgetExceeded(
+                f"{state.route} issued {state.count} queries, budget is {budget}: {normalise_sql(statement)}"
+            )
+
+
+def install_db_instrumentation(engine):
+    """Attach the hooks to an AsyncEngine (through its sync engine)"""
+    sync_engine = getattr(engine, "sync_engine", engine)
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
@@ -0,0 +1,167 @@
+# app/utils/email_dispatch.py
+"""
+Email dispatch subsystem.
+
+The outbox relay hands each claimed batch to send_concurrently, which splits it
+into chunks sent in parallel. The provider call is blocking (the SendGrid client
+is synchronous), so it always runs on a dedicated thread pool and never on the
+event loop. Each send is attempted once; the outbox retries failed rows later
+with full-jitter exponential backoff.
+"""
+import asyncio
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from decouple import config
+from .metrics import EMAIL_SENDS
+
+EMAIL_SENDER = config("EMAIL_SENDER", default="sendgrid")
+EMAIL_WORKERS = config("EMAIL_WORKERS", default=4, cast=int)
+EMAIL_BATCH_SIZE = config("EMAIL_BATCH_SIZE", default=10, cast=int)
+EMAIL_BACKOFF_BASE = config("EMAIL_BACKOFF_BASE", default=0.5, cast=float)
+EMAIL_BACKOFF_CAP = config("EMAIL_BACKOFF_CAP", default=30.0, cast=float)
+#seconds per provider call, connect and read, a hung call would otherwise hold a send thread forever
+EMAIL_SEND_TIMEOUT = config("EMAIL_SEND_TIMEOUT", default=10.0, cast=float)
+
+
+@dataclass
+class EmailMessage:
+    to: str
+    subject: str
+    html: str
+
+
+class SendGridSender:
+    """Blocking SendGrid sender, only ever called from the dispatcher thread pool"""
+    def __init__(self, timeout: float = EMAIL_SEND_TIMEOUT):
+        from sendgrid import SendGridAPIClient
+        from sendgrid.helpers.mail import Email
+        from python_http_client import Client
+        self._client = SendGridAPIClient(config('SENDGRID_API_KEY'), host=config('SENDGRID_HOST', default='https://api.sendgrid.com'))
+        # the SDK builds its HTTP client without a timeout, swap in one that has it
+        client = self._client.client
+        self._client.client = Client(host=client.host, request_headers=client.request_headers, version=3, timeout=timeout)
+        self._from = Email(config('MAIL_FROM_EMAIL'), config('MAIL_FROM_NAME'))
+
+    def send(self, message: EmailMessage):
+        from sendgrid.helpers.mail import Mail, To, Content
+        mail = Mail(
+            from_email=self._from,
+            to_emails=To(message.to),
+            subject=message.subject,
+            html_content=Content("text/html", message.html)
+        )
+        self._client.send(mail)
+
+    def probe(self, timeout: float = 5.0):
+        """Authenticated GET /v3/scopes, checks reachability and the API key without sending anything"""
+        from python_http_client import Client
+        # own client with the shorter probe timeout
+        client = self._client.client
+        Client(host=client.host, request_headers=client.request_headers, version=3, timeout=timeout).scopes.get()
+
+    def send_batch(self, messages):
+        """
+        Send a batch in one thread hop. The v3 mail API only batches recipients
+        sharing one body, and every message here is personalised, so each is its own call.
+        Returns:
+            list of (message, exception) for the sends that failed
+        """
+        failed = []
+        for message in messages:
+            try:
+                self.send(message)
+            except Exception as e:
+                failed.append((message, e))
+        return failed
+
+
+class FakeEmailSender:
+    """Local stand-in for the provider, used for offline benchmarks and load tests"""
+    def __init__(self, latency: float = 0.0, failure_rate: float = 0.0):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.sent = 0
+
+    def send(self, message: EmailMessage):
+        if self.latency:
+            time.sleep(self.latency)
+        if self.failure_rate and random.random() < self.failure_rate:
+            raise ConnectionError("fake sender failure")
+        self.sent += 1
+
+    def probe(self):
+        if self.failure_rate and random.random() < self.failure_rate:
+            raise ConnectionError("fake sender failure")
+
+    def send_batch(self, messages):
+        # one provider call per message, as SendGridSender.send_batch makes
+        failed = []
+        for message in messages:
+            if self.latency:
+                time.sleep(self.latency)
+            if self.failure_rate and random.random() < self.failure_rate:
+                failed.append((message, ConnectionError("fake sender failure")))
+            else:
+                self.sent += 1
+        return failed
+
+
+def build_sender(kind: str = EMAIL_SENDER):
+    if kind == "fake":
+        return FakeEmailSender(latency=config("FAKE_EMAIL_LATENCY", default=0.0, cast=float))
+    return SendGridSender()
+
+
+def backoff_delay(attempt: int, base: float = EMAIL_BACKOFF_BASE, cap: float = EMAIL_BACKOFF_CAP) -> float:
+    """Full jitter exponential backoff"""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class EmailDispatcher:
+    def __init__(self, sender_factory=build_sender, workers: int = EMAIL_WORKERS, batch_size: int = EMAIL_BATCH_SIZE):
+        self.sender_factory = sender_factory
+        self.workers = workers
+        self.batch_size = batch_size
+        self.sender = None
+        self._executor = None
+        self.stats = {"sent": 0, "failed": 0}
+
+    def _ensure_pool(self):
+        if self._executor is None:
+            self.sender = self.sender or self.sender_factory()
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="email")
+
+    async def stop(self):
+        """Release the thread pool, sends already running finish in the background"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    async def send_concurrently(self, messages):
+        """
+        Single attempt over the whole pool, messages are split into batch_size chunks sent in parallel
+        Returns:
+            list of (message, exception) for the sends that failed
+        """
+        self._ensure_pool()
+        loop = asyncio.get_running_loop()
+        chunks = [messages[i:i + self.batch_size] for i in range(0, len(messages), self.batch_size)]
+        results = await asyncio.gather(*(loop.run_in_executor(self._executor, self.sender.send_batch, chunk) for chunk in chunks))
+        failed = [item for chunk_failed in results for item in chunk_failed]
+        self.stats["sent"] += len(messages) - len(failed)
+        self.stats["failed"] += len(failed)
+        EMAIL_SENDS.inc(("sent",), len(messages) - len(failed))
+        EMAIL_SENDS.inc(("failed",), len(failed))
+        return failed
+
+    async def probe(self):
+        """Health check of the provider on the email thread pool, raises when it is unreachable"""
+        self._ensure_pool()
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._executor, self.sender.probe)
+
+
+#process wide dispatcher, used by the in-app outbox relay and the warmer's probe
+email_dispatcher = EmailDispatcher()
@@ -0,0 +1,128 @@
+# app/utils/email_outbox.py
+"""
+Relay that drains the email_outbox table.
+
+Each round runs in three steps so no transaction stays open across provider
+calls:
+- claim: a short transaction leases a batch of due rows (SKIP LOCKED) by moving
+  their available_at OUTBOX_LEASE seconds ahead, and commits
+- send: the batch goes through the email dispatcher thread pool, every provider
+  call bounded by EMAIL_SEND_TIMEOUT
+- record: a second short transaction marks each row sent, retried or failed
+
+Every OUTBOX_PURGE_INTERVAL seconds a relay also deletes sent and failed rows
+older than OUTBOX_RETENTION_DAYS; sent rows already had their html cleared.
+
+Several relays (in-app or the app.cli.outbox_worker process) can run side by
+side without claiming the same row. A relay that dies mid round leaves its rows
+pending, and they are sent again once the lease runs out.
+"""
+import asyncio
+import logging
+import time
+from decouple import config
+from ..database_setup import async_session
+from ..crud.email_outbox import claim_outbox_batch, record_outbox_results, purge_outbox
+from .email_dispatch import EmailDispatcher, EmailMessage, backoff_delay, email_dispatcher, EMAIL_SEND_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_BATCH_SIZE = config("OUTBOX_BATCH_SIZE", default=50, cast=int)
+OUTBOX_POLL_INTERVAL = config("OUTBOX_POLL_INTERVAL", default=1.0, cast=float)
+OUTBOX_MAX_ATTEMPTS = config("OUTBOX_MAX_ATTEMPTS", default=5, cast=int)
+#seconds a claimed row is held, must outlast a round: every message of a batch timing out in turn
+OUTBOX_LEASE = config("OUTBOX_LEASE", default=max(60.0, OUTBOX_BATCH_SIZE * EMAIL_SEND_TIMEOUT), cast=float)
+OUTBOX_RETENTION_DAYS = config("OUTBOX_RETENTION_DAYS", default=7.0, cast=float)
+#seconds between purges of old sent and failed rows, 0 disables
+OUTBOX_PURGE_INTERVAL = config("OUTBOX_PURGE_INTERVAL", default=3600.0, cast=float)
+#rows deleted per purge transaction
+OUTBOX_PURGE_BATCH = 1000
+#run a relay inside the web process, disable when app.cli.outbox_worker runs separately
+OUTBOX_RELAY_IN_APP = config("OUTBOX_RELAY_IN_APP", default=True, cast=bool)
+
+
+class OutboxRelay:
+    def __init__(self, dispatcher=None, batch_size: int = OUTBOX_BATCH_SIZE, poll_interval: float = OUTBOX_POLL_INTERVAL,
+                 max_attempts: int = OUTBOX_MAX_ATTEMPTS, lease: float = OUTBOX_LEASE,
+                 retention_days: float = OUTBOX_RETENTION_DAYS, purge_interval: float = OUTBOX_PURGE_INTERVAL):
+        self.dispatcher = dispatcher or EmailDispatcher()
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.lease = lease
+        self.retention_days = retention_days
+        self.purge_interval = purge_interval
+        self.stats = {"rounds": 0, "sent": 0, "retried": 0, "failed": 0, "purged": 0}
+        self._last_purge = None
+        self._task = None
+        self._stop = None
+
+    async def relay_once(self) -> int:
+        """Claim, send and record one batch, returns the number of rows handled"""
+        async with async_session() as session:
+            rows = await claim_outbox_batch(session, self.batch_size, self.lease)
+            await session.commit()
+        if not rows:
+            return 0
+        # no transaction or pooled connection is held while the provider is called
+        messages = {row.id: EmailMessage(to=row.recipient, subject=row.subject, html=row.html) for row in rows}
+        by_message = {id(message): outbox_id for outbox_id, message in messages.items()}
+        failed = await self.dispatcher.send_concurrently(list(messages.values()))
+        errors = {by_message[id(message)]: error for message, error in failed}
+        async with async_session() as session:
+            given_up = await record_outbox_results(session, rows, errors, self.max_attempts, backoff_delay)
+            await session.commit()
+        self.stats["rounds"] += 1
+        self.stats["sent"] += len(rows) - len(errors)
+        self.stats["failed"] += given_up
+        self.stats["retried"] += len(errors) - given_up
+        return len(rows)
+
+    async def purge_once(self) -> int:
+        """Delete sent and failed rows past retention, a batch per transaction, returns the number deleted"""
+        purged = 0
+        while True:
+            async with async_session() as session:
+                deleted = await purge_outbox(session, self.retention_days * 86400, OUTBOX_PURGE_BATCH)
+                await session.commit()
+            purged += deleted
+            if deleted < OUTBOX_PURGE_BATCH:
+                break
+        self.stats["purged"] += purged
+        return purged
+
+    async def run(self, stop: asyncio.Event):
+        """Drain until stop is set, polling every poll_interval seconds when the outbox is empty"""
+        while not stop.is_set():
+            try:
+                handled = await self.relay_once()
+            except Exception as e:
+                logger.error("outbox relay round failed: %s", e)
+                handled = 0
+            if self.purge_interval and (self._last_purge is None or time.monotonic() - self._last_purge >= self.purge_interval):
+                self._last_purge = time.monotonic()
+                try:
+                    await self.purge_once()
+                except Exception as e:
+                    logger.error("outbox purge failed: %s", e)
+            if handled < self.batch_size:
+                try:
+                    await asyncio.wait_for(stop.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+    def start(self):
+        self._stop = asyncio.Event()
+        self._task = asyncio.create_task(self.run(self._stop), name="outbox-relay")
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._stop.set()
+        await self._task
+        self._task = None
+        await self.dispatcher.stop()
+
+
+#relay used by the web process when OUTBOX_RELAY_IN_APP is set
+outbox_relay = OutboxRelay(dispatcher=email_dispatcher)
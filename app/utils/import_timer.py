@@ -0,0 +1,80 @@
+# app/utils/import_timer.py
+"""
+Opt in per module import timing, installed from app/__init__.py when
+IMPORT_TIME_REPORT is set so that it sees every import the app makes.
+
+Works like python -X importtime but is readable from inside the process: a
+meta path finder wraps each loader and records cumulative and self time per
+module. Only the standard library is imported here.
+"""
+import sys
+import time
+from importlib.abc import MetaPathFinder
+
+
+class _TimedLoader:
+    def __init__(self, loader, timer):
+        self.loader = loader
+        self.timer = timer
+
+    def create_module(self, spec):
+        return self.loader.create_module(spec)
+
+    def exec_module(self, module):
+        self.timer.run(module.__name__, self.loader.exec_module, module)
+
+    def __getattr__(self, name):
+        return getattr(self.loader, name)
+
+
+class ImportTimer(MetaPathFinder):
+    def __init__(self):
+        self.cumulative = {}
+        self.self_time = {}
+        self._stack = []
+
+    def find_spec(self, fullname, path, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is not None:
+                break
+        else:
+            return None
+        if spec.loader is None or not hasattr(spec.loader, "exec_module"):
+            return spec
+        spec.loader = _TimedLoader(spec.loader, self)
+        return spec
+
+    def run(self, name, exec_module, module):
+        self._stack.append(0.0)
+        start = time.perf_counter()
+        try:
+            exec_module(module)
+        finally:
+            elapsed = time.perf_counter() - start
+            children = self._stack.pop()
+            self.cumulative[name] = elapsed
+            self.self_time[name] = elapsed - children
+            if self._stack:
+                self._stack[-1] += elapsed
+
+    def report(self, top=15):
+        """Slowest modules by cumulative time, in seconds"""
+        slowest = sorted(self.cumulative.items(), key=lambda item: item[1], reverse=True)[:top]
+        return [
+            {"module": name, "cumulative": round(seconds, 4), "self": round(self.self_time[name], 4)}
+            for name, seconds in slowest
+        ]
+
+
+import_timer = None
+
+
+def install():
+    global import_timer
+    if import_timer is None:
+        import_timer = ImportTimer()
+        sys.meta_path.insert(0, import_timer)
+    return import_timer
@@ -0,0 +1,174 @@
+# app/utils/logging_setup.py
+"""
+Non-blocking structured logging.
+
+Every handler call on the event loop only puts the record on a bounded queue; a
+QueueListener thread formats it as one JSON line and writes it to stdout. When
+the queue is full the record is dropped and counted instead of blocking the
+request. The request id and the sampling decision are taken in the calling
+thread, where the request's context is still visible.
+"""
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import zlib
+from datetime import datetime, timezone
+from decouple import config
+from .metrics import registry, Counter
+
+LOG_LEVEL = config("LOG_LEVEL", default="INFO")
+#json for log shippers, text for a terminal
+LOG_FORMAT = config("LOG_FORMAT", default="json")
+LOG_QUEUE_SIZE = config("LOG_QUEUE_SIZE", default=10000, cast=int)
+#{"logger prefix": keep ratio}, only records below WARNING are sampled
+LOG_SAMPLE_RULES = json.loads(config("LOG_SAMPLE_RULES", default="{}"))
+
+TEXT_FORMAT = "%(asctime)s [%(levelname)s] %(name)s: %(message)s"
+
+#set per request by the logging middleware, "-" outside a request
+request_id_var = contextvars.ContextVar("request_id", default="-")
+
+#attributes every LogRecord has, anything else came in through extra=
+_RECORD_ATTRS = frozenset(vars(logging.makeLogRecord({}))) | {"message", "asctime", "request_id"}
+
+
+class RequestIdFilter(logging.Filter):
+    def filter(self, record):
+        record.request_id = request_id_var.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keeps a ratio of the sub WARNING records of matching loggers. The decision
+    is hashed from the request id so a request's lines are kept or dropped together
+    """
+    def __init__(self, rules):
+        super().__init__()
+        # longest prefix first so the most specific rule wins
+        self.rules = sorted(((name, float(rate)) for name, rate in rules.items()), key=lambda r: -len(r[0]))
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING or not self.rules:
+            return True
+        for name, rate in self.rules:
+            if record.name == name or record.name.startswith(name + "."):
+                request_id = getattr(record, "request_id", "-")
+                if request_id == "-":
+                    return random.random() < rate
+                return (zlib.crc32(request_id.encode()) % 10000) < rate * 10000
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        payload = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "request_id": getattr(record, "request_id", "-"),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS:
+                payload[key] = value
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(payload, default=str)
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops and counts records when the queue is full"""
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_listener = None
+_queue_handler = None
+#arguments of the last configure_logging call, reused to restart it after a fork
+_settings = None
+
+
+def configure_logging(level=LOG_LEVEL, fmt=LOG_FORMAT, sample_rules=None):
+    """Route the root logger and uvicorn's loggers through the queue, idempotent"""
+    global _listener, _queue_handler, _settings
+    if _listener is not None:
+        return _queue_handler
+    if _settings is None:
+        atexit.register(shutdown_logging)
+    _settings = (level, fmt, sample_rules)
+
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(JsonFormatter() if fmt == "json" else logging.Formatter(TEXT_FORMAT))
+
+    _queue_handler = DroppingQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+    _queue_handler.addFilter(RequestIdFilter())
+    _queue_handler.addFilter(SamplingFilter(LOG_SAMPLE_RULES if sample_rules is None else sample_rules))
+
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(_queue_handler)
+    root.setLevel(level)
+
+    # uvicorn installs its own synchronous stream handlers, send them through the queue too;
+    # a logger without handlers was silenced (--no-access-log) and is left alone
+    for name in ("uvicorn", "uvicorn.access"):
+        uvicorn_logger = logging.getLogger(name)
+        if uvicorn_logger.handlers:
+            uvicorn_logger.handlers.clear()
+            uvicorn_logger.propagate = True
+
+    _listener = logging.handlers.QueueListener(_queue_handler.queue, stream, respect_handler_level=True)
+    _listener.start()
+    return _queue_handler
+
+
+def shutdown_logging():
+    """Flush whatever is still queued, safe to call more than once"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def _before_fork():
+    # the listener thread does not survive a fork and could hold the queue lock,
+    # stop it so parent and child each start their own afterwards
+    global _restart_after_fork
+    _restart_after_fork = _listener is not None
+    shutdown_logging()
+
+
+def _after_fork():
+    if _restart_after_fork:
+        configure_logging(*_settings)
+
+
+_restart_after_fork = False
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(before=_before_fork, after_in_parent=_after_fork, after_in_child=_after_fork)
+
+
+def logging_stats():
+    if _queue_handler is None:
+        return {"queued": 0, "dropped": 0}
+    return {"queued": _queue_handler.queue.qsize(), "dropped": _queue_handler.dropped}
+
+
+LOG_DROPPED = registry.register(Counter(
+    "log_records_dropped_total", "Log records dropped because the log queue was full"))
+registry.add_collector(lambda: LOG_DROPPED.set_total(logging_stats()["dropped"]))
@@ -0,0 +1,324 @@
+# app/utils/metrics.py
+"""
+Minimal Prometheus metrics.
+
+Recording is a dict lookup and an add on the event loop thread; there are no
+locks on the hot path. Each worker process is its own shard: when METRICS_DIR is
+set every process periodically writes a JSON snapshot of its shard there and
+/metrics merges all live shards, so counters, gauges and histograms cover every
+worker. When a worker exits its counters and histograms are folded into
+archive.json in the same directory, as prometheus_client's multiprocess mode
+does, so totals never go backwards; its gauges go with it. Without METRICS_DIR
+only the serving process is reported.
+"""
+import asyncio
+import fcntl
+import json
+import logging
+import os
+import time
+from bisect import bisect_left
+from pathlib import Path
+from decouple import config
+
+logger = logging.getLogger(__name__)
+
+METRICS_DIR = config("METRICS_DIR", default="")
+METRICS_FLUSH_INTERVAL = config("METRICS_FLUSH_INTERVAL", default=1.0, cast=float)
+#shards not refreshed for this long are ignored, and folded into the archive once their pid is gone
+METRICS_STALE_AFTER = config("METRICS_STALE_AFTER", default=30.0, cast=float)
+
+ARCHIVE_NAME = "archive.json"
+LOCK_NAME = "archive.lock"
+#kinds that keep their meaning once the process is gone
+ARCHIVED_KINDS = ("counter", "histogram")
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+
+    def snapshot(self):
+        return {"type": self.kind, "help": self.help, "labelnames": list(self.labelnames),
+                "values": [[list(labels), value] for labels, value in self.values.items()]}
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, labels=(), amount=1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def set_total(self, value, labels=()):
+        """for collectors mirroring a count that is already kept elsewhere"""
+        self.values[labels] = value
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def inc(self, labels=(), amount=1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def dec(self, labels=(), amount=1):
+        self.values[labels] = self.values.get(labels, 0) - amount
+
+    def set(self, value, labels=()):
+        self.values[labels] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, labels=()):
+        # per bucket counts (not cumulative) followed by +Inf, sum and count
+        row = self.values.get(labels)
+        if row is None:
+            row = self.values[labels] = [0] * (len(self.buckets) + 3)
+        row[bisect_left(self.buckets, value)] += 1
+        row[-2] += value
+        row[-1] += 1
+
+    def snapshot(self):
+        data = super().snapshot()
+        data["buckets"] = list(self.buckets)
+        return data
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+        self.collectors = []
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def add_collector(self, collector):
+        """collector() is called before every snapshot to refresh metrics derived from other state"""
+        self.collectors.append(collector)
+
+    def snapshot(self):
+        for collector in self.collectors:
+            try:
+                collector()
+            except Exception as e:
+                logger.warning("metrics collector failed: %s", e)
+        return {name: metric.snapshot() for name, metric in self.metrics.items()}
+
+
+def merge_snapshots(snapshots):
+    """Sum every shard, histograms bucket by bucket"""
+    merged = {}
+    for snap in snapshots:
+        for name, data in snap.items():
+            target = merged.setdefault(name, {**data, "values": {}})
+            for labels, value in data["values"]:
+                key = tuple(labels)
+                if data["type"] == "histogram":
+                    current = target["values"].get(key)
+                    target["values"][key] = value if current is None else [a + b for a, b in zip(current, value)]
+                else:
+                    target["values"][key] = target["values"].get(key, 0) + value
+    return merged
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)] + [f'{n}="{v}"' for n, v in extra]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def render(merged):
+    """Prometheus text exposition format 0.0.4"""
+    lines = []
+    for name, data in merged.items():
+        lines.append(f"# HELP {name} {data['help']}")
+        lines.append(f"# TYPE {name} {data['type']}")
+        names = data["labelnames"]
+        for labels, value in data["values"].items():
+            if data["type"] != "histogram":
+                lines.append(f"{name}{_labels(names, labels)} {value}")
+                continue
+            cumulative = 0
+            for bound, count in zip(data["buckets"], value):
+                cumulative += count
+                lines.append(f"{name}_bucket{_labels(names, labels, [('le', bound)])} {cumulative}")
+            cumulative += value[len(data["buckets"])]
+            lines.append(f"{name}_bucket{_labels(names, labels, [('le', '+Inf')])} {cumulative}")
+            lines.append(f"{name}_sum{_labels(names, labels)} {value[-2]}")
+            lines.append(f"{name}_count{_labels(names, labels)} {value[-1]}")
+    return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+HTTP_REQUEST_DURATION = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template", ("method", "route")))
+HTTP_REQUESTS = registry.register(Counter(
+    "http_requests_total", "HTTP responses by route template and status code", ("method", "route", "status")))
+HTTP_IN_FLIGHT = registry.register(Gauge(
+    "http_requests_in_flight", "HTTP requests currently being served"))
+DB_QUERIES = registry.register(Counter(
+    "db_queries_total", "SQL statements executed", ("operation",)))
+DB_QUERY_DURATION = registry.register(Histogram(
+    "db_query_duration_seconds", "SQL statement duration", ("operation",)))
+DB_QUERIES_PER_REQUEST = registry.register(Histogram(
+    "db_queries_per_request", "Statements issued per request by route template", ("route",),
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 50)))
+UPSTREAM_REQUESTS = registry.register(Counter(
+    "upstream_requests_total", "Calls to upstream services by outcome", ("upstream", "outcome")))
+UPSTREAM_DURATION = registry.register(Histogram(
+    "upstream_request_duration_seconds", "Upstream call latency", ("upstream", "outcome")))
+EMAIL_SENDS = registry.register(Counter(
+    "email_sends_total", "Email send attempts by outcome", ("outcome",)))
+
+
+def _locked(directory, mode):
+    """flock on the archive lock file, shared for readers and exclusive for folds"""
+    handle = open(directory / LOCK_NAME, "a")
+    fcntl.flock(handle, mode)
+    return handle
+
+
+def _merged_snapshot(merged):
+    """merge_snapshots output back into the shard layout"""
+    return {name: {**data, "values": [[list(labels), value] for labels, value in data["values"].items()]}
+            for name, data in merged.items()}
+
+
+def _fold(directory, shard):
+    # caller holds the exclusive lock
+    archive_path = directory / ARCHIVE_NAME
+    try:
+        snapshot = json.loads(shard.read_text())
+    except FileNotFoundError:
+        return
+    except ValueError:
+        snapshot = {}
+    archive = json.loads(archive_path.read_text()) if archive_path.exists() else {}
+    kept = {name: data for name, data in snapshot.items() if data["type"] in ARCHIVED_KINDS}
+    tmp = archive_path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(_merged_snapshot(merge_snapshots([archive, kept]))))
+    tmp.replace(archive_path)
+    shard.unlink()
+
+
+def mark_process_dead(pid, directory=METRICS_DIR):
+    """Fold an exited worker's counters and histograms into the archive and drop its shard"""
+    if not directory:
+        return
+    directory = Path(directory)
+    shard = directory / f"{pid}.json"
+    if not shard.exists():
+        return
+    with _locked(directory, fcntl.LOCK_EX):
+        _fold(directory, shard)
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    # PermissionError still means the pid exists
+    except PermissionError:
+        pass
+    return True
+
+
+class MetricsExporter:
+    """Writes this process's shard to METRICS_DIR and merges every live shard for /metrics"""
+    def __init__(self, directory=METRICS_DIR, interval=METRICS_FLUSH_INTERVAL):
+        self.directory = Path(directory) if directory else None
+        self.interval = interval
+        self._task = None
+
+    @property
+    def shard_path(self):
+        return self.directory / f"{os.getpid()}.json"
+
+    def _write(self, payload):
+        tmp = self.shard_path.with_suffix(".tmp")
+        tmp.write_text(payload)
+        tmp.replace(self.shard_path)
+
+    async def _run(self):
+        while True:
+            try:
+                # snapshot on the loop thread, only the file write goes to a thread
+                await asyncio.to_thread(self._write, json.dumps(registry.snapshot()))
+            except Exception as e:
+                logger.warning("metrics flush failed: %s", e)
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self.directory is None or self._task is not None:
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._task = asyncio.create_task(self._run(), name="metrics-exporter")
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        # last flush, then hand the totals to the archive
+        try:
+            self._write(json.dumps(registry.snapshot()))
+            mark_process_dead(os.getpid(), self.directory)
+        except Exception as e:
+            logger.warning("metrics archive failed: %s", e)
+
+    def _read_shards(self):
+        snapshots = []
+        if self.directory is None or not self.directory.exists():
+            return snapshots
+        now = time.time()
+        own = self.shard_path.name
+        dead = []
+        # shared lock: a fold moves values from a shard to the archive in one step for readers
+        with _locked(self.directory, fcntl.LOCK_SH):
+            for path in self.directory.glob("*.json"):
+                if path.name == own:
+                    continue
+                try:
+                    if path.name != ARCHIVE_NAME and now - path.stat().st_mtime > METRICS_STALE_AFTER:
+                        # a worker killed without going through the supervisor
+                        if path.stem.isdigit() and not _pid_alive(int(path.stem)):
+                            dead.append(int(path.stem))
+                        continue
+                    snapshots.append(json.loads(path.read_text()))
+                except (OSError, ValueError):
+                    continue
+        for pid in dead:
+            # counted from the next scrape on
+            try:
+                mark_process_dead(pid, self.directory)
+            except OSError as e:
+                logger.warning("metrics archive failed: %s", e)
+        return snapshots
+
+    async def collect(self):
+        """Prometheus text for this process merged with every other live shard"""
+        own = registry.snapshot()
+        others = await asyncio.to_thread(self._read_shards) if self.directory is not None else []
+        return render(merge_snapshots([own, *others]))
+
+
+metrics_exporter = MetricsExporter()
@@ -0,0 +1,61 @@
+# app/utils/openapi_cache.py
+"""
+OpenAPI document and docs pages, built once and served from memory.
+
+The schema is serialised to compact JSON a single time, at startup (warmup) or
+on the first request, and kept with its gzip and brotli variants. Setting
+OPENAPI_FILE serves a document generated at build time with
+python -m app.cli.export_openapi instead of generating it in process.
+"""
+import json
+import logging
+from pathlib import Path
+from decouple import config
+from fastapi.openapi.docs import get_swagger_ui_html, get_redoc_html
+from .compression import PrecompressedBody
+
+OPENAPI_FILE = config("OPENAPI_FILE", default="")
+OPENAPI_URL = "/openapi.json"
+
+logger = logging.getLogger(__name__)
+
+
+def render_openapi(app) -> bytes:
+    """The schema exactly as served, compact and key order preserved"""
+    return json.dumps(app.openapi(), separators=(",", ":"), ensure_ascii=False).encode()
+
+
+class OpenAPICache:
+    def __init__(self):
+        self.schema = None
+        self.docs = None
+        self.redoc = None
+        self.source = None
+
+    def _load_file(self):
+        path = Path(OPENAPI_FILE)
+        if not path.is_file():
+            logger.warning("OPENAPI_FILE %s not found, generating the schema instead", path)
+            return None
+        return path.read_bytes()
+
+    def build(self, app):
+        body = self._load_file() if OPENAPI_FILE else None
+        self.source = "file" if body is not None else "generated"
+        if body is None:
+            body = render_openapi(app)
+        self.schema = PrecompressedBody(body, "application/json")
+        docs = get_swagger_ui_html(openapi_url=OPENAPI_URL, title=f"{app.title} - Swagger UI")
+        redoc = get_redoc_html(openapi_url=OPENAPI_URL, title=f"{app.title} - ReDoc")
+        self.docs = PrecompressedBody(docs.body, "text/html; charset=utf-8")
+        self.redoc = PrecompressedBody(redoc.body, "text/html; charset=utf-8")
+        return self
+
+    def get(self, app):
+        # built by warmup, this only runs when warmup is off or failed
+        if self.schema is None:
+            self.build(app)
+        return self
+
+
+openapi_cache = OpenAPICache()
@@ -0,0 +1,185 @@
+# app/utils/profiling.py
+"""
+On demand profiling of a single request.
+
+Only installed when PROFILING_ENABLED is set; otherwise neither the middleware
+nor the /internal/profiles routes exist. A request is profiled when it carries
+X-Profile together with a valid X-Admin-Token:
+
+    X-Profile: store    run normally, keep the profile, its id comes back in X-Profile-Id
+    X-Profile: inline   replace the response with the profile itself
+
+pyinstrument is used when it is installed; it samples and, in async mode,
+follows the request's coroutine across awaits, so the crud and utils frames
+show up under the endpoint that awaited them. Without it cProfile is used; it
+is deterministic but sees every coroutine the loop runs while the request is
+in flight, not just this one.
+"""
+import asyncio
+import cProfile
+import hmac
+import io
+import os
+import pstats
+import re
+import tempfile
+import time
+import uuid
+from pathlib import Path
+from decouple import config
+from ..sec import ADMIN_TOKEN
+
+PROFILING_ENABLED = config("PROFILING_ENABLED", default=False, cast=bool)
+PROFILE_DIR = Path(config("PROFILE_DIR", default=os.path.join(tempfile.gettempdir(), "cat-fact-profiles")))
+#oldest profiles beyond this many are deleted
+PROFILE_KEEP = config("PROFILE_KEEP", default=50, cast=int)
+#auto, pyinstrument or cprofile
+PROFILER = config("PROFILER", default="auto")
+PROFILE_ID = re.compile(r"^[0-9a-f]{32}$")
+
+MEDIA_TYPES = {".html": "text/html; charset=utf-8", ".txt": "text/plain; charset=utf-8"}
+
+
+class _PyinstrumentRun:
+    extension = ".html"
+
+    def __init__(self):
+        from pyinstrument import Profiler
+        self.profiler = Profiler(async_mode="enabled")
+        self.profiler.start()
+
+    def stop(self):
+        self.profiler.stop()
+
+    def render(self):
+        return self.profiler.output_html()
+
+
+class _CProfileRun:
+    extension = ".txt"
+
+    def __init__(self):
+        self.profiler = cProfile.Profile()
+        self.profiler.enable()
+
+    def stop(self):
+        self.profiler.disable()
+
+    def render(self):
+        out = io.StringIO()
+        pstats.Stats(self.profiler, stream=out).sort_stats("cumulative").print_stats(80)
+        return out.getvalue()
+
+
+def _profiler_class():
+    if PROFILER in ("auto", "pyinstrument"):
+        try:
+            import pyinstrument  # noqa: F401
+            return _PyinstrumentRun
+        except ImportError:
+            if PROFILER == "pyinstrument":
+                raise
+    return _CProfileRun
+
+
+def _header(scope, name):
+    for key, value in scope["headers"]:
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+
+def _store(profile_id, extension, content):
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    (PROFILE_DIR / f"{profile_id}{extension}").write_text(content)
+    profiles = sorted(PROFILE_DIR.iterdir(), key=lambda p: p.stat().st_mtime, reverse=True)
+    for old in profiles[PROFILE_KEEP:]:
+        old.unlink(missing_ok=True)
+
+
+def list_profiles():
+    if not PROFILE_DIR.exists():
+        return []
+    profiles = sorted(PROFILE_DIR.iterdir(), key=lambda p: p.stat().st_mtime, reverse=True)
+    return [
+        {"id": p.stem, "format": p.suffix.lstrip("."), "size": p.stat().st_size, "created_at": p.stat().st_mtime}
+        for p in profiles if p.suffix in MEDIA_TYPES
+    ]
+
+
+def load_profile(profile_id):
+    """Returns (content, media type) or None, the id is validated so it cannot leave PROFILE_DIR"""
+    if not PROFILE_ID.match(profile_id):
+        return None
+    for extension, media_type in MEDIA_TYPES.items():
+        path = PROFILE_DIR / f"{profile_id}{extension}"
+        if path.exists():
+            return path.read_text(), media_type
+    return None
+
+
+class ProfilingMiddleware:
+    """Pure ASGI middleware running admin flagged requests under a profiler, one at a time"""
+    def __init__(self, app):
+        self.app = app
+        self.profiler_class = _profiler_class()
+        self.busy = False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        mode = _header(scope, b"x-profile")
+        if mode is None:
+            return await self.app(scope, receive, send)
+        token = _header(scope, b"x-admin-token")
+        if mode not in ("store", "inline") or not ADMIN_TOKEN or not token or not hmac.compare_digest(token, ADMIN_TOKEN):
+            return await self.app(scope, receive, send)
+        if self.busy:
+            return await self.app(scope, receive, self._with_headers(send, [(b"x-profile-status", b"busy")]))
+
+        profile_id = uuid.uuid4().hex
+        inline = mode == "inline"
+        status_code = 500
+
+        async def capture(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            if not inline:
+                await send(message)
+
+        self.busy = True
+        start = time.perf_counter()
+        run = self.profiler_class()
+        try:
+            await self.app(scope, receive, capture if inline else self._with_headers(send, [(b"x-profile-id", profile_id.encode())]))
+        finally:
+            run.stop()
+            self.busy = False
+        duration = time.perf_counter() - start
+
+        # rendering and the file write stay off the event loop
+        content = await asyncio.to_thread(run.render)
+        await asyncio.to_thread(_store, profile_id, run.extension, content)
+        if inline:
+            body = content.encode()
+            await send({
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [
+                    (b"content-type", MEDIA_TYPES[run.extension].encode()),
+                    (b"content-length", str(len(body)).encode()),
+                    (b"x-profile-id", profile_id.encode()),
+                    (b"x-profiled-status", str(status_code).encode()),
+                    (b"x-profiled-duration", f"{duration:.6f}".encode()),
+                ],
+            })
+            await send({"type": "http.response.body", "body": body})
+
+    @staticmethod
+    def _with_headers(send, headers):
+        async def wrapper(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", ()), *headers]
+            await send(message)
+        return wrapper
@@ -0,0 +1,155 @@
+# app/utils/server_timing.py
+"""
+Request scoped timing breakdown, emitted as a Server-Timing header.
+
+ServerTimingMiddleware puts a dict in a context variable for the duration of a
+request; the DB event hooks, fetch_cat_fact, the email builders and TimedRoute
+add their durations to it. Outside a request, or when SERVER_TIMING_ENABLED is
+off and the middleware is not installed, recording is a single context
+variable lookup.
+"""
+import contextvars
+import functools
+import inspect
+import logging
+import time
+from fastapi.routing import APIRoute
+from decouple import config
+
+SERVER_TIMING_ENABLED = config("SERVER_TIMING_ENABLED", default=False, cast=bool)
+#also log the breakdown of every request as a structured record
+SERVER_TIMING_LOG = config("SERVER_TIMING_LOG", default=False, cast=bool)
+
+logger = logging.getLogger(__name__)
+
+#metric name -> [seconds, count], None when no request is being timed
+_timings = contextvars.ContextVar("server_timings", default=None)
+
+
+def record(name, seconds):
+    timings = _timings.get()
+    if timings is None:
+        return
+    entry = timings.get(name)
+    if entry is None:
+        timings[name] = [seconds, 1]
+    else:
+        entry[0] += seconds
+        entry[1] += 1
+
+
+class timed:
+    """Context manager or decorator adding the elapsed time of a block to metric name"""
+    def __init__(self, name):
+        self.name = name
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record(self.name, time.perf_counter() - self.start)
+        return False
+
+    def __call__(self, func):
+        name = self.name
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _timings.get() is None:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record(name, time.perf_counter() - start)
+        return wrapper
+
+
+def header_value(timings):
+    parts = []
+    for name, (seconds, count) in timings.items():
+        part = f"{name};dur={seconds * 1000:.2f}"
+        if count > 1:
+            part += f';desc="{count} calls"'
+        parts.append(part)
+    return ", ".join(parts)
+
+
+class TimedRoute(APIRoute):
+    """
+    Splits the handler into deps (parameter and dependency resolution), app (the
+    endpoint body) and render (response validation and serialisation)
+    """
+    def __init__(self, path, endpoint, **kwargs):
+        if inspect.iscoroutinefunction(endpoint):
+            endpoint = _mark_endpoint(endpoint)
+        super().__init__(path, endpoint, **kwargs)
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def timed_handler(request):
+            timings = _timings.get()
+            if timings is None:
+                return await handler(request)
+            start = time.perf_counter()
+            response = await handler(request)
+            end = time.perf_counter()
+            marks = timings.pop("_endpoint", None)
+            if marks is None:
+                record("handler", end - start)
+            else:
+                endpoint_start, endpoint_end = marks
+                record("deps", endpoint_start - start)
+                record("app", endpoint_end - endpoint_start)
+                record("render", end - endpoint_end)
+            return response
+        return timed_handler
+
+
+def _mark_endpoint(endpoint):
+    @functools.wraps(endpoint)
+    async def wrapper(*args, **kwargs):
+        timings = _timings.get()
+        if timings is None:
+            return await endpoint(*args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return await endpoint(*args, **kwargs)
+        finally:
+            timings["_endpoint"] = (start, time.perf_counter())
+    return wrapper
+
+
+class ServerTimingMiddleware:
+    """Pure ASGI middleware adding the Server-Timing header, installed only when SERVER_TIMING_ENABLED"""
+    def __init__(self, app, log=SERVER_TIMING_LOG):
+        self.app = app
+        self.log = log
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        timings = {}
+        token = _timings.set(timings)
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                timings.pop("_endpoint", None)
+                timings["total"] = [time.perf_counter() - start, 1]
+                message["headers"] = [*message.get("headers", ()), (b"server-timing", header_value(timings).encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _timings.reset(token)
+        if self.log and timings:
+            logger.info(
+                "server timing %s %s", scope["method"], scope["path"],
+                extra={"timings": {name: round(seconds * 1000, 3) for name, (seconds, _) in timings.items()}}
+            )
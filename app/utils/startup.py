@@ -0,0 +1,98 @@
+# app/utils/startup.py
+"""
+Startup warmup and report.
+
+lifespan awaits warmup() before the app starts serving, so the first real
+request does not pay for opening database connections, the TLS handshake to
+the cat fact upstream or building and compressing the OpenAPI schema. Every
+step has a timeout and a failing step is logged, never fatal: a cold
+dependency is slower, not down.
+"""
+import asyncio
+import logging
+import time
+from decouple import config
+from sqlalchemy import text
+from .. import STARTED_AT
+from . import import_timer
+from .cat_fact import _fetch_cat_fact_sync
+from .openapi_cache import openapi_cache
+
+WARMUP_ENABLED = config("WARMUP_ENABLED", default=True, cast=bool)
+WARMUP_TIMEOUT = config("WARMUP_TIMEOUT", default=10.0, cast=float)
+#connections opened up front, the engine keeps up to its pool size (5) idle
+WARMUP_DB_CONNECTIONS = config("WARMUP_DB_CONNECTIONS", default=5, cast=int)
+
+logger = logging.getLogger(__name__)
+
+#read by /internal/startup
+startup_state = {"ready": False, "ready_after_seconds": None, "warmup": {}, "imports": None}
+
+
+async def _prime_pool(engine, connections=WARMUP_DB_CONNECTIONS):
+    async def open_one():
+        conn = await engine.connect()
+        await conn.execute(text("SELECT 1"))
+        return conn
+
+    results = await asyncio.gather(*(open_one() for _ in range(connections)), return_exceptions=True)
+    # closing hands the connections back to the pool, still open
+    for result in results:
+        if not isinstance(result, BaseException):
+            await result.close()
+    failures = [result for result in results if isinstance(result, BaseException)]
+    if failures:
+        raise failures[0]
+
+
+async def _prime_upstream():
+    _, outcome = await asyncio.to_thread(_fetch_cat_fact_sync)
+    if outcome != "ok":
+        raise RuntimeError(f"cat fact upstream answered {outcome}")
+
+
+async def _prime_routes(app):
+    # the schema is built and compressed on the first /openapi.json or /docs hit otherwise,
+    # a preforking server has already built it before starting the workers
+    openapi_cache.get(app)
+
+
+async def _step(name, coro):
+    start = time.perf_counter()
+    try:
+        await asyncio.wait_for(coro, WARMUP_TIMEOUT)
+        startup_state["warmup"][name] = {"ok": True, "seconds": round(time.perf_counter() - start, 4)}
+    except Exception as e:
+        startup_state["warmup"][name] = {"ok": False, "seconds": round(time.perf_counter() - start, 4), "error": repr(e)}
+        logger.warning("warmup step %s failed: %r", name, e)
+
+
+def reset_start_time():
+    """A forked worker measures its startup from the fork, not from the supervisor's imports"""
+    global STARTED_AT
+    STARTED_AT = time.perf_counter()
+
+
+async def warmup(app, engine):
+    """Run the warmup steps concurrently, then mark the app ready and log the startup report"""
+    if WARMUP_ENABLED:
+        await asyncio.gather(
+            _step("db_pool", _prime_pool(engine)),
+            _step("upstream", _prime_upstream()),
+            _step("routes", _prime_routes(app)),
+        )
+    startup_state["ready"] = True
+    startup_state["ready_after_seconds"] = round(time.perf_counter() - STARTED_AT, 4)
+    if import_timer.import_timer is not None:
+        startup_state["imports"] = import_timer.import_timer.report()
+    log_startup_report()
+
+
+def log_startup_report():
+    steps = ", ".join(f"{name} {step['seconds']:.3f}s{'' if step['ok'] else ' FAILED'}" for name, step in startup_state["warmup"].items())
+    logger.info(
+        "ready %.3fs after import started (warmup: %s)", startup_state["ready_after_seconds"], steps or "off",
+        extra={"startup": startup_state}
+    )
+    for row in startup_state["imports"] or ():
+        logger.info("import %s %.1fms (self %.1fms)", row["module"], row["cumulative"] * 1000, row["self"] * 1000)
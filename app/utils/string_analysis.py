@@ -1,6 +1,17 @@
 import re
+import hashlib
+from collections import Counter
 from fastapi import HTTPException, status
 
+#width of each bucket in the string length histogram
+STATS_LENGTH_BUCKET = 10
+#rows removed per transaction by the bulk delete
+BULK_DELETE_CHUNK = 500
+#chunks one bulk delete request may remove, which bounds its query budget; callers repeat until complete
+BULK_DELETE_MAX_CHUNKS = 20
+#keys of StringAnalysis.properties, in the order create_with_hash writes them
+PROPERTY_KEYS = ("length", "is_palindrome", "unique_characters", "word_count", "sha256_hash", "character_frequency_map")
+
 async def interpret_natural_language_query(query: str) -> dict:
     try:
         q = query.lower().strip()
@@ -52,11 +63,85 @@ async def interpret_natural_language_query(query: str) -> dict:
             details = "Query parsed but resulted in conflicting filters"
         )
 
+def length_bucket(length: int) -> str:
+    """Histogram bucket label for a string length e.g 13 -> "10-19" """
+    low = (length // STATS_LENGTH_BUCKET) * STATS_LENGTH_BUCKET
+    return f"{low}-{low + STATS_LENGTH_BUCKET - 1}"
+
+
+def string_stats_deltas(properties_list, sign: int = 1) -> Counter:
+    """
+    Aggregate counter deltas for a batch of analysed strings.
+    Args:
+        properties_list: iterable of StringAnalysis.properties dicts
+        sign: 1 for inserted strings, -1 for deleted strings
+    Returns:
+        Counter keyed by (metric, bucket)
+    """
+    deltas = Counter()
+    for props in properties_list:
+        deltas[("total", "all")] += sign
+        deltas[("length_sum", "all")] += sign * props["length"]
+        deltas[("palindrome", str(bool(props["is_palindrome"])).lower())] += sign
+        deltas[("length", length_bucket(props["length"]))] += sign
+        deltas[("word_count", str(props["word_count"]))] += sign
+        # bumped by inserts and deletes alike, never goes back, list ETags are derived from it
+        deltas[("generation", "all")] += 1
+    return deltas
+
+
+def _projection_suffix(projection):
+    return "" if projection is None else "." + hashlib.sha256(",".join(projection).encode()).hexdigest()[:8]
+
+
+def string_etag(string_value: str, projection=None) -> str:
+    """
+    Strong ETag for GET /strings/{string_value} without touching the database:
+    a stored string's id is the SHA-256 of its value and its row never changes
+    """
+    string_id = hashlib.sha256(string_value.strip().lower().encode("utf-8")).hexdigest()
+    return f'"{string_id}{_projection_suffix(projection)}"'
+
+
+def list_etag(generation: int, path: str, query: str) -> str:
+    """Strong ETag for a string listing, any insert or delete moves the generation"""
+    digest = hashlib.sha256(f"{generation}:{path}?{query}".encode()).hexdigest()[:32]
+    return f'"g{generation}-{digest}"'
+
+
 from fastapi_pagination import Params
-from typing import Annotated
+from fastapi import Query
+from typing import Annotated, Optional, Tuple
 from pydantic import Field
 
 
 class StringParams(Params):
     """Default pagination parameters with a custom page size for all users"""
-    size: Annotated[int, Field(gt=1, le=50)] = 10  # Default page size set to 10, max 50, min 1
\ No newline at end of file
+    size: Annotated[int, Field(gt=1, le=50)] = 10  # Default page size set to 10, max 50, min 1
+
+
+def string_projection(
+    fields: Optional[str] = Query(None, description="Comma separated properties keys to return e.g length,is_palindrome"),
+    exclude: Optional[str] = Query(None, description="Comma separated properties keys to leave out e.g character_frequency_map")
+) -> Optional[Tuple[str, ...]]:
+    """
+    Resolve fields= / exclude= into the properties keys to select
+    - Returns:
+        - None when the full properties object is wanted, else the tuple of keys to project in SQL
+    """
+    if fields is None and exclude is None:
+        return None
+    if fields is not None and exclude is not None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Use either fields or exclude, not both"
+        )
+    requested = [k.strip() for k in (fields if fields is not None else exclude).split(",") if k.strip()]
+    if not requested or any(k not in PROPERTY_KEYS for k in requested):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid query parameter values or types"
+        )
+    if fields is not None:
+        return tuple(k for k in PROPERTY_KEYS if k in requested)
+    return tuple(k for k in PROPERTY_KEYS if k not in requested)
\ No newline at end of file
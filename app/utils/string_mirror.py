@@ -0,0 +1,235 @@
+# app/utils/string_mirror.py
+"""
+In-process columnar mirror of the stringanalysis table.
+
+Properties are held as compact parallel arrays (length, word_count, is_palindrome
+and a 64 bit character mask) so the string filters can be answered by scanning
+memory instead of casting JSONB in postgres. The mirror is warmed at startup and
+kept in sync by the writes in app/crud/string_analysis.py; it only sees writes
+made by its own process, so the consistency check is the way to detect drift.
+
+A reload builds a fresh set of columns next to the live ones. Adds and removes
+arriving while its snapshot query runs are journaled and replayed onto the new
+columns, which then replace the live ones in one step on the event loop, so a
+reload never drops a write made during it.
+"""
+import sys
+from array import array
+from functools import lru_cache
+from sqlmodel import select, cast, Integer, Boolean
+from ..model.cat_fact_db import StringAnalysis
+
+
+@lru_cache(maxsize=None)
+def _numpy():
+    # numpy is optional and only worth importing once the mirror is in use
+    try:
+        import numpy
+        return numpy
+    except ImportError:  # fall back to pure python scans
+        return None
+
+#a-z -> bits 0-25, 0-9 -> bits 26-35, space -> bit 36 are exact, anything else shares bits 37-63
+_EXACT_BITS = {c: i for i, c in enumerate("abcdefghijklmnopqrstuvwxyz0123456789 ")}
+_SHARED_BASE = len(_EXACT_BITS)
+_SHARED_BITS = 64 - _SHARED_BASE
+
+
+def _char_bit(char: str) -> int:
+    bit = _EXACT_BITS.get(char)
+    if bit is None:
+        bit = _SHARED_BASE + ord(char) % _SHARED_BITS
+    return 1 << bit
+
+
+def char_mask(chars) -> int:
+    """Bitmask of a set of characters"""
+    mask = 0
+    for char in set(chars):
+        mask |= _char_bit(char)
+    return mask
+
+
+class StringMirror:
+    def __init__(self):
+        #one journal per reload in progress, each a list of (method name, args)
+        self._journals = []
+        self.clear()
+
+    def clear(self):
+        self.ids = []
+        self.values = []
+        self.created_at = []
+        self.length = array("i")
+        self.word_count = array("i")
+        self.is_palindrome = array("b")
+        self.char_mask = array("Q")
+        self._pos = {}
+        self.ready = False
+
+    def __len__(self):
+        return len(self.ids)
+
+    def add(self, string_id, value, properties, created_at):
+        for journal in self._journals:
+            journal.append(("add", (string_id, value, properties, created_at)))
+        if string_id in self._pos:
+            return
+        self._pos[string_id] = len(self.ids)
+        self.ids.append(string_id)
+        self.values.append(value)
+        self.created_at.append(created_at)
+        self.length.append(properties["length"])
+        self.word_count.append(properties["word_count"])
+        self.is_palindrome.append(1 if properties["is_palindrome"] else 0)
+        self.char_mask.append(char_mask(value))
+
+    def remove(self, string_id):
+        """Swap-remove so every column stays dense"""
+        for journal in self._journals:
+            journal.append(("remove", (string_id,)))
+        pos = self._pos.pop(string_id, None)
+        if pos is None:
+            return
+        last = len(self.ids) - 1
+        for column in (self.ids, self.values, self.created_at, self.length, self.word_count, self.is_palindrome, self.char_mask):
+            column[pos] = column[last]
+            column.pop()
+        if pos != last:
+            self._pos[self.ids[pos]] = pos
+
+    async def warm(self, session):
+        """Load every string from the database, replacing the current contents"""
+        statement = select(
+            StringAnalysis.id,
+            StringAnalysis.value,
+            cast(StringAnalysis.properties["length"], Integer),
+            cast(StringAnalysis.properties["word_count"], Integer),
+            cast(StringAnalysis.properties["is_palindrome"], Boolean),
+            StringAnalysis.created_at
+        )
+        journal = []
+        self._journals.append(journal)
+        try:
+            result = await session.execute(statement)
+            rows = result.all()
+        finally:
+            self._journals.remove(journal)
+        # no await from here on, so no write lands between the replay and the swap
+        fresh = StringMirror()
+        for string_id, value, length, word_count, is_palindrome, created_at in rows:
+            fresh.add(string_id, value, {"length": length, "word_count": word_count, "is_palindrome": is_palindrome}, created_at)
+        # writes made while the snapshot was read, whether or not it already saw them
+        for method, args in journal:
+            getattr(fresh, method)(*args)
+        self._swap(fresh)
+        # pay for the numpy import during warmup rather than on the first filter
+        _numpy()
+        self.ready = True
+        return len(self)
+
+    def _swap(self, fresh):
+        self.ids = fresh.ids
+        self.values = fresh.values
+        self.created_at = fresh.created_at
+        self.length = fresh.length
+        self.word_count = fresh.word_count
+        self.is_palindrome = fresh.is_palindrome
+        self.char_mask = fresh.char_mask
+        self._pos = fresh._pos
+
+    def filter(self, is_palindrome=None, min_length=None, max_length=None, word_count=None, contains_character=None, contains_all=None, contains_any=None):
+        """
+        Ids of the strings matching the filters, same semantics as build_string_filters
+        """
+        n = len(self.ids)
+        if n == 0:
+            return []
+        contains_character = contains_character.lower() if contains_character is not None else None
+        contains_all = [c.lower() for c in contains_all] if contains_all else None
+        contains_any = [c.lower() for c in contains_any] if contains_any else None
+        np = _numpy()
+        if np is not None:
+            keep = np.ones(n, dtype=bool)
+            length = np.frombuffer(self.length, dtype=np.int32, count=n)
+            masks = np.frombuffer(self.char_mask, dtype=np.uint64, count=n)
+            if is_palindrome is not None:
+                keep &= np.frombuffer(self.is_palindrome, dtype=np.int8, count=n) == int(is_palindrome)
+            if min_length is not None:
+                keep &= length >= min_length
+            if max_length is not None:
+                keep &= length <= max_length
+            if word_count is not None:
+                keep &= np.frombuffer(self.word_count, dtype=np.int32, count=n) == word_count
+            required = char_mask(contains_all or "") | (char_mask(contains_character) if contains_character and len(contains_character) == 1 else 0)
+            if required:
+                keep &= (masks & np.uint64(required)) == np.uint64(required)
+            if contains_any:
+                keep &= (masks & np.uint64(char_mask(contains_any))) != 0
+            candidates = np.flatnonzero(keep).tolist()
+        else:
+            candidates = range(n)
+            if is_palindrome is not None:
+                flag = int(is_palindrome)
+                candidates = [i for i in candidates if self.is_palindrome[i] == flag]
+            if min_length is not None:
+                candidates = [i for i in candidates if self.length[i] >= min_length]
+            if max_length is not None:
+                candidates = [i for i in candidates if self.length[i] <= max_length]
+            if word_count is not None:
+                candidates = [i for i in candidates if self.word_count[i] == word_count]
+            required = char_mask(contains_all or "") | (char_mask(contains_character) if contains_character and len(contains_character) == 1 else 0)
+            if required:
+                candidates = [i for i in candidates if self.char_mask[i] & required == required]
+            if contains_any:
+                wanted = char_mask(contains_any)
+                candidates = [i for i in candidates if self.char_mask[i] & wanted]
+        # the mask only proves absence, confirm characters that share bits and substrings on the value
+        values = self.values
+        shared_all = [c for c in (contains_all or []) if c not in _EXACT_BITS]
+        if contains_character is not None and (len(contains_character) != 1 or contains_character not in _EXACT_BITS):
+            shared_all.append(contains_character)
+        if shared_all:
+            candidates = [i for i in candidates if all(c in values[i] for c in shared_all)]
+        if contains_any and any(c not in _EXACT_BITS for c in contains_any):
+            candidates = [i for i in candidates if any(c in values[i] for c in contains_any)]
+        return [self.ids[i] for i in candidates]
+
+    async def consistency_check(self, session):
+        """Compare the mirrored ids with the database"""
+        result = await session.execute(select(StringAnalysis.id))
+        db_ids = set(result.scalars().all())
+        mirror_ids = set(self._pos)
+        missing = db_ids - mirror_ids
+        extra = mirror_ids - db_ids
+        return {
+            "consistent": not missing and not extra,
+            "db_count": len(db_ids),
+            "mirror_count": len(mirror_ids),
+            "missing": len(missing),
+            "extra": len(extra),
+        }
+
+    def memory_report(self):
+        """Approximate bytes held by the mirror, per column"""
+        columns = {
+            "length": self.length.buffer_info()[1] * self.length.itemsize,
+            "word_count": self.word_count.buffer_info()[1] * self.word_count.itemsize,
+            "is_palindrome": self.is_palindrome.buffer_info()[1] * self.is_palindrome.itemsize,
+            "char_mask": self.char_mask.buffer_info()[1] * self.char_mask.itemsize,
+            "ids": sys.getsizeof(self.ids) + sum(sys.getsizeof(s) for s in self.ids),
+            "values": sys.getsizeof(self.values) + sum(sys.getsizeof(s) for s in self.values),
+            "created_at": sys.getsizeof(self.created_at) + sum(sys.getsizeof(d) for d in self.created_at),
+            "position_index": sys.getsizeof(self._pos),
+        }
+        return {
+            "rows": len(self),
+            "ready": self.ready,
+            "vectorised": _numpy() is not None,
+            "total_bytes": sum(columns.values()),
+            "columns": columns,
+        }
+
+
+#process wide mirror, populated only when STRING_MIRROR_ENABLED is set
+string_mirror = StringMirror()
@@ -0,0 +1,143 @@
+# app/utils/warmer.py
+"""
+Background warmer, started by lifespan after the startup warmup.
+
+Every WARMER_INTERVAL seconds it checks out WARMER_MIN_CONNECTIONS pool
+connections with SELECT 1 and fetches from the cat fact upstream, so idle
+connections and the upstream keep-alive connection stay open between bursts of
+traffic, and probes the email provider. Every WARMER_CACHE_REFRESH seconds it
+reloads the in-process string mirror, which bounds how stale one worker's
+mirror is with writes made in another. Each check's outcome is kept in status,
+and the readiness answer is serialised once per round, so the keepalive and
+health routes return them without doing any I/O or work of their own.
+"""
+import asyncio
+import json
+import logging
+import time
+from datetime import datetime, timezone
+from decouple import config, Csv
+from ..database_setup import async_session, engine
+from ..crud.string_analysis import warm_string_mirror
+from .startup import _prime_pool, _prime_upstream
+from .email_dispatch import email_dispatcher
+
+WARMER_ENABLED = config("WARMER_ENABLED", default=True, cast=bool)
+WARMER_INTERVAL = config("WARMER_INTERVAL", default=30.0, cast=float)
+WARMER_TIMEOUT = config("WARMER_TIMEOUT", default=5.0, cast=float)
+#connections touched each round, at most the engine's pool size (5) stay idle
+WARMER_MIN_CONNECTIONS = config("WARMER_MIN_CONNECTIONS", default=2, cast=int)
+#seconds between in-process cache reloads, 0 disables
+WARMER_CACHE_REFRESH = config("WARMER_CACHE_REFRESH", default=300.0, cast=float)
+#checks that must pass for /readyz; the upstream has a fallback fact and email goes through the outbox
+READINESS_REQUIRED = tuple(config("READINESS_REQUIRED", default="database", cast=Csv()))
+#a status older than this many intervals means the warmer stalled, /readyz reports not ready
+READINESS_STALE_ROUNDS = 3
+
+logger = logging.getLogger(__name__)
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
+class BackgroundWarmer:
+    def __init__(self, interval: float = WARMER_INTERVAL, timeout: float = WARMER_TIMEOUT,
+                 min_connections: int = WARMER_MIN_CONNECTIONS, cache_refresh: float = WARMER_CACHE_REFRESH,
+                 required=READINESS_REQUIRED):
+        self.interval = interval
+        self.timeout = timeout
+        self.min_connections = min_connections
+        self.cache_refresh = cache_refresh
+        self.required = required
+        self.checks = {
+            "database": lambda: _prime_pool(engine, self.min_connections),
+            "upstream": _prime_upstream,
+            "email": email_dispatcher.probe,
+        }
+        #name -> ok, latency_ms, last_checked, last_success, error; replaced whole, never mutated
+        self.status = {}
+        self.stats = {"rounds": 0, "cache_refreshes": 0}
+        #(ready, JSON body) for /readyz, None until the first round finishes
+        self.readiness = None
+        self.last_round = None
+        self._last_refresh = time.monotonic()
+        self._task = None
+        self._stop = None
+
+    def register(self, name, check):
+        """Add a check, an async callable raising when the dependency is unhealthy"""
+        self.checks[name] = check
+
+    async def _check(self, name, check):
+        start = time.perf_counter()
+        previous = self.status.get(name, {})
+        try:
+            await asyncio.wait_for(check(), self.timeout)
+            error = None
+        except Exception as e:
+            error = repr(e)
+        entry = {
+            "ok": error is None,
+            "latency_ms": round((time.perf_counter() - start) * 1000, 3),
+            "last_checked": _now(),
+            "last_success": _now() if error is None else previous.get("last_success"),
+            "error": error,
+        }
+        if error is not None and previous.get("ok", True):
+            logger.warning("dependency %s check failed: %s", name, error)
+        self.status = {**self.status, name: entry}
+
+    async def refresh_caches(self):
+        async with async_session() as session:
+            loaded = await warm_string_mirror(session)
+        self.stats["cache_refreshes"] += 1
+        return loaded
+
+    async def run_once(self):
+        await asyncio.gather(*(self._check(name, check) for name, check in self.checks.items()))
+        if self.cache_refresh and time.monotonic() - self._last_refresh >= self.cache_refresh:
+            self._last_refresh = time.monotonic()
+            try:
+                await self.refresh_caches()
+            except Exception as e:
+                logger.error("cache refresh failed: %s", e)
+        self.stats["rounds"] += 1
+        self._publish()
+
+    def _publish(self):
+        ready = all(self.status.get(name, {}).get("ok", False) for name in self.required)
+        body = json.dumps({"ready": ready, "required": list(self.required), "dependencies": self.status}).encode()
+        self.readiness = (ready, body)
+        self.last_round = time.monotonic()
+
+    def is_fresh(self):
+        return self.last_round is not None and time.monotonic() - self.last_round <= READINESS_STALE_ROUNDS * self.interval
+
+    async def run(self, stop: asyncio.Event):
+        """Check right away, then every interval seconds until stop is set"""
+        while not stop.is_set():
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error("warmer round failed: %s", e)
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self):
+        if self._task is not None:
+            return
+        self._stop = asyncio.Event()
+        self._task = asyncio.create_task(self.run(self._stop), name="background-warmer")
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._stop.set()
+        await self._task
+        self._task = None
+
+
+background_warmer = BackgroundWarmer()
@@ -0,0 +1,43 @@
+"""
+Offline throughput benchmark for the email dispatcher.
+
+Drives EmailDispatcher.send_concurrently, the path the outbox relay uses, with
+FakeEmailSender so no provider or network is needed. Messages go in rounds of
+--round-size, like relay batches of OUTBOX_BATCH_SIZE rows.
+
+    python -m benchmarks.email_dispatch --messages 500 --latency 0.05 --workers 1 4 16
+"""
+import argparse
+import asyncio
+import time
+from app.utils.email_dispatch import EmailDispatcher, EmailMessage, FakeEmailSender
+
+
+async def run_once(messages, latency, workers, batch_size, round_size, failure_rate):
+    sender = FakeEmailSender(latency=latency, failure_rate=failure_rate)
+    dispatcher = EmailDispatcher(sender_factory=lambda: sender, workers=workers, batch_size=batch_size)
+    batch = [EmailMessage(to=f"user{i}@example.com", subject="bench", html="<p>bench</p>") for i in range(messages)]
+    start = time.perf_counter()
+    for i in range(0, messages, round_size):
+        await dispatcher.send_concurrently(batch[i:i + round_size])
+    elapsed = time.perf_counter() - start
+    await dispatcher.stop()
+    return {"workers": workers, "batch_size": batch_size, "round_size": round_size, "seconds": round(elapsed, 3),
+            "messages_per_second": round(messages / elapsed, 1), **dispatcher.stats}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds per provider call")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--batch-size", type=int, default=10, help="messages per thread hop (EMAIL_BATCH_SIZE)")
+    parser.add_argument("--round-size", type=int, default=50, help="messages per relay round (OUTBOX_BATCH_SIZE)")
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    for workers in args.workers:
+        print(asyncio.run(run_once(args.messages, args.latency, workers, args.batch_size, args.round_size, args.failure_rate)))
+
+
+if __name__ == "__main__":
+    main()
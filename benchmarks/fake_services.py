@@ -0,0 +1,160 @@
+"""
+Local stand-ins for catfact.ninja and the SendGrid v3 mail API.
+
+    python -m benchmarks.fake_services --catfact-port 8701 --sendgrid-port 8702
+
+Point the app at them with
+
+    CAT_FACT_API_URL=http://127.0.0.1:8701/fact
+    SENDGRID_HOST=http://127.0.0.1:8702
+
+Both answer from a thread per connection with an optional fixed latency and
+failure rate, so upstream slowness and errors can be reproduced. The SendGrid
+sink keeps the mails it accepted so a harness can read verification links.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FACTS = (
+    "Cats sleep for around thirteen to sixteen hours a day.",
+    "A group of cats is called a clowder.",
+    "Cats have five toes on their front paws and four on the back.",
+    "A cat's nose print is unique, much like a human fingerprint.",
+)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # headers and body are separate writes, without this delayed ACKs add ~40ms per response
+    disable_nagle_algorithm = True
+    service = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status, payload=None):
+        body = b"" if payload is None else json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _delay_or_fail(self):
+        service = self.service
+        if service.latency:
+            time.sleep(service.latency)
+        if service.failure_rate and random.random() < service.failure_rate:
+            self._reply(503, {"error": "injected failure"})
+            return True
+        return False
+
+
+class CatFactHandler(_Handler):
+    def do_GET(self):
+        if self._delay_or_fail():
+            return
+        if self.path.split("?")[0] != "/fact":
+            return self._reply(404, {"error": "not found"})
+        self.service.count()
+        fact = random.choice(FACTS)
+        self._reply(200, {"fact": fact, "length": len(fact)})
+
+
+class SendGridHandler(_Handler):
+    def do_GET(self):
+        # the app's health probe
+        if self._delay_or_fail():
+            return
+        if self.path != "/v3/scopes":
+            return self._reply(404, {"errors": [{"message": "not found"}]})
+        self._reply(200, {"scopes": ["mail.send"]})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length)
+        if self._delay_or_fail():
+            return
+        if self.path != "/v3/mail/send":
+            return self._reply(404, {"errors": [{"message": "not found"}]})
+        mail = json.loads(body or b"{}")
+        self.service.accept(mail)
+        self._reply(202)
+
+
+class FakeService:
+    """One stand-in server on its own daemon thread"""
+    def __init__(self, handler, port=0, latency=0.0, failure_rate=0.0, host="127.0.0.1"):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.requests = 0
+        self.mails = []
+        self._lock = threading.Lock()
+        handler_class = type(handler.__name__, (handler,), {"service": self})
+        self.server = ThreadingHTTPServer((host, port), handler_class)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count(self):
+        with self._lock:
+            self.requests += 1
+
+    def accept(self, mail):
+        with self._lock:
+            self.requests += 1
+            self.mails.append(mail)
+
+    def take_mails(self):
+        with self._lock:
+            mails, self.mails = self.mails, []
+        return mails
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def fake_catfact(**kwargs):
+    return FakeService(CatFactHandler, **kwargs)
+
+
+def fake_sendgrid(**kwargs):
+    return FakeService(SendGridHandler, **kwargs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--catfact-port", type=int, default=8701)
+    parser.add_argument("--sendgrid-port", type=int, default=8702)
+    parser.add_argument("--catfact-latency", type=float, default=0.0, help="seconds added to every fact")
+    parser.add_argument("--catfact-failure-rate", type=float, default=0.0)
+    parser.add_argument("--sendgrid-latency", type=float, default=0.0)
+    parser.add_argument("--sendgrid-failure-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    catfact = fake_catfact(port=args.catfact_port, latency=args.catfact_latency, failure_rate=args.catfact_failure_rate).start()
+    sendgrid = fake_sendgrid(port=args.sendgrid_port, latency=args.sendgrid_latency, failure_rate=args.sendgrid_failure_rate).start()
+    print(f"CAT_FACT_API_URL={catfact.url}/fact")
+    print(f"SENDGRID_HOST={sendgrid.url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        catfact.stop()
+        sendgrid.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Before/after throughput of the request logging middleware.
+
+Calls each middleware stack directly as ASGI (no server, no sockets) so only the
+middleware overhead is measured. "before" is the previous BaseHTTPMiddleware
+implementation kept here verbatim in behaviour; "after" is app.middleware.LoggingMiddleware.
+
+    python -m benchmarks.middleware --requests 5000 --body-kb 64
+"""
+import argparse
+import asyncio
+import logging
+import time
+from fastapi import Request
+from starlette.middleware.base import BaseHTTPMiddleware
+from app.middleware import LoggingMiddleware
+
+logger = logging.getLogger("benchmarks.middleware")
+
+
+class LegacyLoggingMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next):
+        if request.url.path in ["/docs", "/redoc", "/openapi.json", "/favicon.ico"]:
+            return await call_next(request)
+        start_time = time.time()
+        if request.method in ["POST", "PUT", "PATCH"]:
+            body = await request.body()
+            logger.info(f"{request.method} {request.url.path} (body size: {len(body)} bytes)")
+        else:
+            logger.info(f"{request.method} {request.url.path}")
+        response = await call_next(request)
+        duration = time.time() - start_time
+        logger.info(f"{request.method} {request.url.path} [{response.status_code}] {duration:.3f}s")
+        return response
+
+
+async def endpoint(scope, receive, send):
+    # drain the body like a real endpoint would
+    more = True
+    while more:
+        message = await receive()
+        more = message.get("more_body", False)
+    await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"application/json")]})
+    await send({"type": "http.response.body", "body": b'{"ok":true}'})
+
+
+async def drive(app, method, body, chunks, requests):
+    chunk = body[: len(body) // chunks] if body else b""
+    headers = [(b"content-length", str(len(chunk) * chunks).encode())] if body else []
+    scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": method, "scheme": "http",
+             "path": "/strings", "raw_path": b"/strings", "root_path": "", "query_string": b"", "headers": headers,
+             "server": ("bench", 80), "client": ("bench", 1)}
+
+    async def send(message):
+        pass
+
+    start = time.perf_counter()
+    for _ in range(requests):
+        sent = 0
+
+        async def receive():
+            nonlocal sent
+            if sent < chunks:
+                sent += 1
+                return {"type": "http.request", "body": chunk, "more_body": sent < chunks}
+            await asyncio.sleep(3600)
+            return {"type": "http.disconnect"}
+
+        await app(dict(scope), receive, send)
+    return requests / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--body-kb", type=int, default=64)
+    parser.add_argument("--chunks", type=int, default=4)
+    args = parser.parse_args()
+    # measure middleware cost, not handler I/O
+    logging.disable(logging.CRITICAL)
+    body = b"x" * (args.body_kb * 1024)
+    for label, app in (("before", LegacyLoggingMiddleware(endpoint)), ("after", LoggingMiddleware(endpoint))):
+        for method, payload in (("GET", b""), ("POST", body)):
+            rate = asyncio.run(drive(app, method, payload, args.chunks, args.requests))
+            print(f"{label:6} {method:4} {rate:10.0f} req/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""
+Offline microbenchmarks for the CPU hot paths.
+
+    python -m benchmarks.run                        # run everything, print a table
+    python -m benchmarks.run --save-baseline        # store the results as the baseline
+    python -m benchmarks.run --compare              # deltas against the baseline
+    python -m benchmarks.run -k frequency --output results.json
+
+Each case is timed with timeit: autorange picks a loop count that takes at
+least 0.2s, then the best of --repeat runs is reported per call. No database,
+network or settings beyond what importing the app modules needs.
+"""
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import timeit
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import List
+from pydantic import TypeAdapter
+from app.model.cat_fact_db import StringAnalysis
+from app.schema.add_user import Register
+from app.schema.cat_fact import MeOut
+from app.schema.string_analysis import StringAnaly, StringBody
+from app.utils.string_analysis import interpret_natural_language_query
+
+DEFAULT_BASELINE = Path(__file__).with_name("baseline.json")
+SIZES = (16, 256, 4096, 65536)
+QUERIES = (
+    "all single word palindromic strings",
+    "strings longer than 10 characters",
+    "strings containing the letter z",
+    "palindromic strings that contain the first vowel",
+)
+
+
+def _text(size):
+    words = "the quick brown fox jumps over a lazy dog racecar level"
+    return (words * (size // len(words) + 1))[:size].strip() or "a"
+
+
+def _run_sync(coro):
+    # the query interpreter never awaits, so one send runs it to completion without a loop
+    try:
+        coro.send(None)
+    except StopIteration as stop:
+        return stop.value
+    raise RuntimeError("coroutine suspended")
+
+
+def cases():
+    """name -> zero argument callable"""
+    found = {}
+    for size in SIZES:
+        text = _text(size)
+        found[f"create_with_hash[{size}]"] = lambda text=text: StringAnalysis.create_with_hash(text)
+        found[f"character_frequency[{size}]"] = lambda text=text: StringAnalysis._get_character_frequency(text)
+
+    for query in QUERIES:
+        found[f"interpret_query[{query}]"] = lambda query=query: _run_sync(interpret_natural_language_query(query))
+
+    register = {"email": " Jane.Doe@Example.com ", "stack": "Python/FastAPI", "name": "jane mary-doe"}
+    found["validate_register"] = lambda: Register.model_validate(register)
+    body = {"value": "a man a plan a canal panama"}
+    found["validate_string_body"] = lambda: StringBody.model_validate(body)
+
+    now = datetime.now(timezone.utc)
+    me = MeOut(
+        status="success",
+        user={"email": "jane@example.com", "name": "Jane Doe", "stack": "Python/FastAPI"},
+        timestamp=now,
+        fact="Cats sleep for around thirteen to sixteen hours a day.",
+    )
+    found["serialise_me_out"] = lambda: me.model_dump_json()
+
+    row = StringAnalysis.create_with_hash(_text(256))
+    analy = StringAnaly(id=row.id, value=row.value, properties=row.properties, created_at=now)
+    found["serialise_string_analy"] = lambda: analy.model_dump_json()
+    page = [analy] * 50
+    adapter = TypeAdapter(List[StringAnaly])
+    found["serialise_string_analy_x50"] = lambda: adapter.dump_json(page)
+    return found
+
+
+def measure(func, repeat):
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    number = max(number, 1)
+    # best of several runs, the minimum is the least disturbed by other load
+    best = min(timer.repeat(repeat=repeat, number=number)) / number
+    return {"ns_per_call": round(best * 1e9, 1), "calls_per_run": number}
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+        "commit": commit,
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+    }
+
+
+def compare(results, baseline, threshold):
+    """rows of (name, baseline ns, current ns, delta %, flag); positive delta is slower"""
+    rows = []
+    for name, current in results.items():
+        before = baseline.get(name)
+        if before is None:
+            rows.append((name, None, current["ns_per_call"], None, "new"))
+            continue
+        delta = (current["ns_per_call"] - before["ns_per_call"]) / before["ns_per_call"] * 100
+        flag = "REGRESSION" if delta > threshold else "improved" if delta < -threshold else ""
+        rows.append((name, before["ns_per_call"], current["ns_per_call"], delta, flag))
+    return rows
+
+
+def _format_ns(ns):
+    if ns is None:
+        return "-"
+    for unit, scale in (("s", 1e9), ("ms", 1e6), ("us", 1e3)):
+        if ns >= scale:
+            return f"{ns / scale:.2f}{unit}"
+    return f"{ns:.0f}ns"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-k", "--filter", help="only run cases whose name contains this")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", type=Path, help="write the results JSON here")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="write the results to --baseline")
+    parser.add_argument("--compare", action="store_true", help="compare against --baseline")
+    parser.add_argument("--threshold", type=float, default=10.0, help="percent slower that counts as a regression")
+    parser.add_argument("--fail-on-regression", action="store_true", help="exit 1 when any case regressed")
+    args = parser.parse_args()
+
+    selected = {name: func for name, func in cases().items() if not args.filter or args.filter in name}
+    results = {}
+    for name, func in selected.items():
+        results[name] = measure(func, args.repeat)
+        print(f"{name:<60} {_format_ns(results[name]['ns_per_call']):>10}", flush=True)
+
+    document = {"environment": environment(), "results": results}
+    if args.output:
+        args.output.write_text(json.dumps(document, indent=2))
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(document, indent=2))
+        print(f"baseline saved to {args.baseline}")
+
+    if args.compare:
+        if not args.baseline.exists():
+            sys.exit(f"no baseline at {args.baseline}, run with --save-baseline first")
+        saved = json.loads(args.baseline.read_text())
+        print(f"\ncompared with baseline from {saved['environment'].get('commit')} ({saved['environment']['timestamp']})")
+        regressed = False
+        for name, before, current, delta, flag in compare(results, saved["results"], args.threshold):
+            change = "-" if delta is None else f"{delta:+.1f}%"
+            print(f"{name:<60} {_format_ns(before):>10} -> {_format_ns(current):>10} {change:>8} {flag}")
+            regressed = regressed or flag == "REGRESSION"
+        if regressed and args.fail_on_regression:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
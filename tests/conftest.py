@@ -0,0 +1,43 @@
+"""
+Tests run the app against a real Postgres database, set TEST_DATABASE_URL to one
+that may be written to; tests needing it are skipped otherwise.
+
+The environment is fixed here, before the app is imported, because settings are
+read at import time.
+"""
+import os
+import pytest
+
+TEST_DATABASE_URL = os.environ.get("TEST_DATABASE_URL")
+
+if TEST_DATABASE_URL:
+    os.environ["DATABASE_URL"] = TEST_DATABASE_URL
+os.environ["QUERY_BUDGET_STRICT"] = "True"
+for name, value in {
+    "SECRET_KEY": "test-secret",
+    "ALGORITHM": "HS256",
+    "KEEP_ALIVE_TOKEN": "test-keep-alive",
+    "ADMIN_TOKEN": "test-admin",
+    "EMAIL_SENDER": "fake",
+    "OUTBOX_RELAY_IN_APP": "False",
+    "WARMUP_ENABLED": "False",
+    "WARMER_ENABLED": "False",
+    "STRING_MIRROR_ENABLED": "False",
+    "CAT_FACT_API_URL": "http://127.0.0.1:1/fact",
+}.items():
+    os.environ.setdefault(name, value)
+
+
+@pytest.fixture(scope="session")
+def app():
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL is not set")
+    from app.main import app
+    return app
+
+
+@pytest.fixture(scope="session")
+def client(app):
+    from fastapi.testclient import TestClient
+    with TestClient(app) as client:
+        yield client
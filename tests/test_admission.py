@@ -0,0 +1,19 @@
+import asyncio
+from app.middleware import AdmissionPool, ADMISSION_SHED, admission_controller, _collect_admission
+
+
+def test_queue_timeout_is_shed_once(monkeypatch):
+    pool = AdmissionPool("timeout-test", capacity=1, max_queue=1, timeout=0.01)
+    monkeypatch.setitem(admission_controller.pools, pool.name, pool)
+    _collect_admission()
+    before = ADMISSION_SHED.values[(pool.name,)]
+
+    async def scenario():
+        assert await pool.acquire(1)
+        # queued behind the held unit until the timeout expires
+        return await pool.acquire(1)
+
+    assert asyncio.run(scenario()) is False
+    _collect_admission()
+    assert pool.timed_out == 1
+    assert ADMISSION_SHED.values[(pool.name,)] == before + 1
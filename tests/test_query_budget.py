@@ -0,0 +1,69 @@
+import os
+import uuid
+import pytest
+from fastapi import APIRouter, Depends
+from sqlalchemy import text
+
+
+def _value():
+    return f"budget {uuid.uuid4().hex}"
+
+
+def test_create_string_within_budget(client):
+    response = client.post("/strings", json={"value": _value()})
+    assert response.status_code == 201, response.text
+
+
+def test_search_all_within_budget(client):
+    client.post("/strings", json={"value": _value()})
+    response = client.get("/strings/search/all")
+    assert response.status_code == 200, response.text
+    assert response.json()["items"]
+
+
+def test_single_string_within_budget(client):
+    value = _value()
+    client.post("/strings", json={"value": value})
+    response = client.get(f"/strings/{value}")
+    assert response.status_code == 200, response.text
+    assert response.json()["value"] == value
+
+
+def test_bulk_delete_requires_admin(client):
+    response = client.delete("/strings", params={"min_length": 0})
+    assert response.status_code == 403
+
+
+def test_bulk_delete_within_budget(client):
+    from app.utils.string_analysis import BULK_DELETE_MAX_CHUNKS
+    marker = uuid.uuid4().hex
+    for i in range(BULK_DELETE_MAX_CHUNKS + 1):
+        client.post("/strings", json={"value": f"{marker} {i}"})
+    admin = {"X-Admin-Token": os.environ["ADMIN_TOKEN"]}
+    # one row per chunk, so the first request stops at the chunk limit
+    response = client.delete("/strings", params={"contains_character": marker, "chunk_size": 1}, headers=admin)
+    assert response.status_code == 200, response.text
+    assert response.json()["count"] == BULK_DELETE_MAX_CHUNKS
+    assert response.json()["complete"] is False
+    response = client.delete("/strings", params={"contains_character": marker, "chunk_size": 1}, headers=admin)
+    assert response.json()["count"] == 1
+    assert response.json()["complete"] is True
+
+
+def test_route_over_budget_fails(app, client):
+    from app.database_setup import get_db
+    from app.utils.db_instrumentation import query_budget, QueryBudgetExceeded
+
+    router = APIRouter()
+
+    @router.get("/tests/over-budget")
+    @query_budget(1)
+    async def over_budget(session=Depends(get_db)):
+        await session.execute(text("SELECT 1"))
+        await session.execute(text("SELECT 2"))
+        return {}
+
+    # mounted on the shared app, pooled connections belong to the session client's event loop
+    app.include_router(router)
+    with pytest.raises(QueryBudgetExceeded, match="budget is 1"):
+        client.get("/tests/over-budget")
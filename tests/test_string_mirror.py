@@ -0,0 +1,57 @@
+import asyncio
+from datetime import datetime, timezone
+from app.utils.string_mirror import StringMirror
+
+NOW = datetime.now(timezone.utc)
+
+
+def _row(string_id, value):
+    return (string_id, value, len(value), len(value.split()), value == value[::-1], NOW)
+
+
+def _props(value):
+    return {"length": len(value), "word_count": len(value.split()), "is_palindrome": value == value[::-1]}
+
+
+class _Result:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def all(self):
+        return self.rows
+
+
+class _SlowSession:
+    """Returns the snapshot once released, so writes can land while the reload reads it"""
+    def __init__(self, rows):
+        self.rows = rows
+        self.reading = asyncio.Event()
+        self.release = asyncio.Event()
+
+    async def execute(self, statement):
+        self.reading.set()
+        await self.release.wait()
+        return _Result(self.rows)
+
+
+def test_reload_keeps_writes_made_during_it():
+    async def scenario():
+        mirror = StringMirror()
+        mirror.add("a", "abba", _props("abba"), NOW)
+        mirror.add("b", "cat", _props("cat"), NOW)
+        mirror.ready = True
+        # the snapshot still has b, misses c and already has d
+        session = _SlowSession([_row("a", "abba"), _row("b", "cat"), _row("d", "dog")])
+        reload = asyncio.create_task(mirror.warm(session))
+        await session.reading.wait()
+        mirror.add("c", "level", _props("level"), NOW)
+        mirror.remove("b")
+        mirror.add("d", "dog", _props("dog"), NOW)
+        session.release.set()
+        await reload
+        return mirror
+
+    mirror = asyncio.run(scenario())
+    assert sorted(mirror.ids) == ["a", "c", "d"]
+    assert sorted(mirror.filter(is_palindrome=True)) == ["a", "c"]
+    assert mirror._journals == []